@@ -0,0 +1,124 @@
+"""Measure AsyncRAGSession throughput as the number of concurrent sessions grows.
+
+Usage: uv run python benchmarks/async_sessions.py --sessions 1,4,16,64 --turns 3 --latency 0.2
+
+Every session sends --turns queries one after another, all sessions at once
+on one event loop. The stub model waits --latency seconds before streaming
+its tokens and each turn makes one blocking retrieve_context call, so
+throughput should grow almost linearly with sessions until the tool thread
+pool or the CPU saturates. The sync RAGSession answering the same turns one
+at a time is shown as the baseline. Pass --history sqlite to also write
+every message through the thread-offloaded SQLite history store, and
+--cancel to check that a cancelled turn leaves its session unchanged.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from core.rag_session import AsyncInMemorySessionStore, AsyncRAGSession, InMemorySessionStore, RAGSession
+from storage.chat_history_store import AsyncSQLiteHistoryStore
+from stub_chat_model import create_stub_agent
+
+
+async def _no_summary(summary, messages):
+    return summary
+
+
+def _sync_baseline(agent, turns):
+    session = RAGSession(store=InMemorySessionStore(), agent=agent, summarize=lambda summary, messages: summary)
+    start = time.perf_counter()
+    for turn in range(turns):
+        session.process_query(f"question {turn}")
+    return turns / (time.perf_counter() - start)
+
+
+async def _session(agent, store, history_store, index, turns, latencies, first_tokens):
+    session = AsyncRAGSession(
+        session_id=f"session-{index}",
+        store=store,
+        history_store=history_store,
+        agent=agent,
+        summarize=_no_summary,
+    )
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = None
+        async for event in session.astream_query(f"question {turn} from session {index}"):
+            if event["type"] == "text" and first is None:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first or 0.0)
+
+
+async def _run(agent, count, turns, history_store):
+    store = AsyncInMemorySessionStore()
+    latencies, first_tokens = [], []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(_session(agent, store, history_store, i, turns, latencies, first_tokens) for i in range(count))
+    )
+    elapsed = time.perf_counter() - start
+    for i in range(count):
+        state = await store.load(f"session-{i}")
+        if len(state["history"]) != 2 * turns:
+            raise AssertionError(f"session-{i} saved {len(state['history'])} messages, expected {2 * turns}")
+    return {
+        "turns_per_s": count * turns / elapsed,
+        "p50_s": statistics.median(latencies),
+        "max_s": max(latencies),
+        "first_token_s": statistics.median(first_tokens),
+    }
+
+
+async def _check_cancel(agent):
+    store = AsyncInMemorySessionStore()
+    session = AsyncRAGSession(store=store, agent=agent, summarize=_no_summary)
+    await session.aprocess_query("first question")
+    task = asyncio.create_task(session.aprocess_query("cancelled question"))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    state = await store.load(session.session_id)
+    if [message["content"] for message in state["history"]][-2:-1] != ["first question"]:
+        raise AssertionError("Cancelled turn changed the saved session")
+    await session.aprocess_query("next question")
+    print("Cancel check passed: the cancelled turn was not saved and the session kept working.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,4,16,64")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2, help="Model time to first token, seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tool-latency", type=float, default=0.02)
+    parser.add_argument("--history", choices=["none", "sqlite"], default="none")
+    parser.add_argument("--cancel", action="store_true")
+    args = parser.parse_args()
+
+    agent = create_stub_agent(args.latency, args.token_delay, args.tool_latency)
+    baseline = _sync_baseline(agent, args.turns)
+    with tempfile.TemporaryDirectory() as directory:
+        history_store = (
+            AsyncSQLiteHistoryStore(os.path.join(directory, "history.db")) if args.history == "sqlite" else None
+        )
+        print(f"{'sessions':<10}{'turns/s':>10}{'speedup':>10}{'p50 s':>10}{'max s':>10}{'1st token s':>13}")
+        print(f"{'sync':<10}{baseline:>10.2f}{1.0:>10.1f}")
+        for count in (int(value) for value in args.sessions.split(",")):
+            result = asyncio.run(_run(agent, count, args.turns, history_store))
+            print(
+                f"{count:<10}{result['turns_per_s']:>10.2f}{result['turns_per_s'] / baseline:>10.1f}"
+                f"{result['p50_s']:>10.2f}{result['max_s']:>10.2f}{result['first_token_s']:>13.2f}"
+            )
+        if args.cancel:
+            asyncio.run(_check_cancel(agent))
+
+
+if __name__ == "__main__":
+    main()
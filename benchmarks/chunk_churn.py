@@ -0,0 +1,114 @@
+"""Count chunks re-embedded per typical edit for each chunking mode.
+
+Usage: uv run python benchmarks/chunk_churn.py [--vault /path/to/vault] [--notes 200]
+Without --vault, synthetic notes of three shapes are generated: short
+sections under "##" headings, long notes without any heading, and notes with
+a long preamble before their first heading. The recursive splitter counts
+start_index per header section, so an insert only shifts the chunks after
+it in the same section; the long heading-less shapes are where that section
+is the whole (or most of the) note.
+"""
+import argparse
+import random
+from pathlib import Path
+
+from core.index_pipeline import doc_id, split_note
+
+_WORDS = (
+    "project meeting notes decision follow up review design index vault query "
+    "chunk embedding latency budget owner deadline risk summary context draft"
+).split()
+
+
+def _paragraph(rng):
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 20))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def _sections(rng):
+    parts = []
+    for section in range(rng.randint(2, 6)):
+        parts.append(f"\n## Section {section}\n")
+        for _ in range(rng.randint(2, 8)):
+            parts.append("\n" + _paragraph(rng) + "\n")
+    return "".join(parts)
+
+
+def _sectioned_note(rng):
+    return f"# Note {rng.randint(1, 10_000)}\n" + _sections(rng)
+
+
+def _flat_note(rng):
+    return "\n\n".join(_paragraph(rng) for _ in range(rng.randint(20, 40))) + "\n"
+
+
+def _preamble_note(rng):
+    return _flat_note(rng) + _sections(rng)
+
+
+_SHAPES = {
+    "sectioned": _sectioned_note,
+    "no headings": _flat_note,
+    "long preamble": _preamble_note,
+}
+
+
+def _edits(text, rng):
+    paragraphs = text.split("\n\n")
+    middle = len(paragraphs) // 2
+    yield "insert line at top", "A new first line.\n" + text
+    edited = list(paragraphs)
+    edited[middle] = edited[middle].replace(" ", " quickly ", 1)
+    yield "edit word in middle", "\n\n".join(edited)
+    yield "append paragraph", text + "\n\n" + _paragraph(rng) + "\n"
+    removed = paragraphs[:middle] + paragraphs[middle + 1:]
+    yield "delete middle paragraph", "\n\n".join(removed)
+
+
+def _ids(source, text, mode):
+    return {doc_id(doc) for doc in split_note(source, text, mode)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vault", default=None)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.vault:
+        paths = sorted(Path(args.vault).rglob("*.md"))[: args.notes]
+        notes = [("vault", str(path), path.read_text(encoding="utf-8")) for path in paths]
+    else:
+        notes = [
+            (shape, f"{shape}-{i}.md", make_note(rng))
+            for shape, make_note in _SHAPES.items()
+            for i in range(args.notes)
+        ]
+
+    modes = ("recursive", "content")
+    totals = {}
+    counts = {}
+    for shape, source, text in notes:
+        counts[shape] = counts.get(shape, 0) + 1
+        before = {mode: _ids(source, text, mode) for mode in modes}
+        for edit_name, edited in _edits(text, random.Random(rng.random())):
+            for mode in modes:
+                after = _ids(source, edited, mode)
+                stats = totals.setdefault((shape, edit_name, mode), [0, 0])
+                stats[0] += len(after - before[mode])
+                stats[1] += len(after)
+
+    print(", ".join(f"{count} {shape} notes" for shape, count in counts.items()))
+    print(f"{'shape':<15}{'edit':<26}{'mode':<12}{'re-embedded/note':>18}{'share of chunks':>18}")
+    for (shape, edit_name, mode), (changed, total) in totals.items():
+        share = changed / total if total else 0.0
+        print(f"{shape:<15}{edit_name:<26}{mode:<12}{changed / counts[shape]:>18.2f}{share:>18.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Compare Chroma disk size and load time for text and offsets chunk storage.
+
+Usage: uv run python benchmarks/chunk_storage.py --notes 2000 --dimensions 768
+
+Builds the same synthetic vault into two persistent Chroma directories with
+the real indexing pipeline, once storing chunk text and once storing only
+offsets and hashes, then reports the size of each directory, the time to
+reopen the collection and run a first query, and the cost of reading the
+hit chunks back from the vault. Vectors come from the offline hashed
+embedder; pick --dimensions to match your embedding model, since the
+vector share of the index decides how much dropping the text saves.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+from langchain_chroma import Chroma
+
+from core.chunk_reader import hydrate_chunks
+from core.embedding_scheduler import EmbeddingScheduler
+from core.index_manifest import IndexManifest
+from core.index_pipeline import VaultIndexer
+from stub_embeddings import HashedEmbeddings
+
+_WORDS = (
+    "project meeting review plan budget design launch hiring database latency "
+    "customer roadmap feedback release migration backup deploy notes ideas weekly"
+).split()
+
+
+def _write_vault(vault, notes, rng):
+    for i in range(notes):
+        folder = vault / f"area-{i % 10}"
+        folder.mkdir(parents=True, exist_ok=True)
+        sections = []
+        for s in range(rng.randint(2, 6)):
+            paragraphs = [
+                " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120))) + "."
+                for _ in range(rng.randint(1, 4))
+            ]
+            sections.append(f"## Section {s}\n\n" + "\n\n".join(paragraphs))
+        (folder / f"note-{i}.md").write_text(f"# Note {i}\n\n" + "\n\n".join(sections), encoding="utf-8")
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def _build(vault, persist_dir, storage, embeddings):
+    vector_store = Chroma(
+        collection_name="storage_benchmark",
+        embedding_function=embeddings,
+        persist_directory=persist_dir,
+    )
+    indexer = VaultIndexer(
+        vector_store,
+        IndexManifest(os.path.join(persist_dir, "manifest.sqlite3")),
+        EmbeddingScheduler(embeddings, batch_size=500),
+        chunk_storage=storage,
+    )
+    start = time.perf_counter()
+    stats = indexer.sync_vault(str(vault))
+    return stats["chunks_added"], time.perf_counter() - start
+
+
+def _reopen(persist_dir, embeddings, query):
+    start = time.perf_counter()
+    # A fresh client so nothing is served from the previous client's caches.
+    client = chromadb.PersistentClient(path=persist_dir)
+    vector_store = Chroma(
+        client=client,
+        collection_name="storage_benchmark",
+        embedding_function=embeddings,
+    )
+    vector_store.similarity_search(query, k=10)
+    return vector_store, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    embeddings = HashedEmbeddings(dimensions=args.dimensions)
+    with tempfile.TemporaryDirectory() as tmp:
+        vault = Path(tmp, "vault")
+        _write_vault(vault, args.notes, rng)
+        print(f"Vault: {args.notes} notes, {_dir_size(vault) / 1e6:.1f} MB")
+        print(f"{'storage':<10}{'chunks':>8}{'build s':>10}{'disk MB':>10}{'reopen ms':>11}{'hydrate ms':>12}")
+        for storage in ("text", "offsets"):
+            persist_dir = os.path.join(tmp, f"chroma-{storage}")
+            chunks, build_seconds = _build(vault, persist_dir, storage, embeddings)
+            size = _dir_size(persist_dir) - os.path.getsize(os.path.join(persist_dir, "manifest.sqlite3"))
+            queries = [" ".join(rng.sample(_WORDS, 3)) for _ in range(args.queries)]
+            vector_store, reopen_ms = _reopen(persist_dir, embeddings, queries[0])
+            hydrate_ms = []
+            for query in queries:
+                docs = vector_store.similarity_search(query, k=10)
+                start = time.perf_counter()
+                hydrated = hydrate_chunks(docs)
+                hydrate_ms.append((time.perf_counter() - start) * 1000)
+                assert all(doc.page_content for doc in hydrated)
+            print(
+                f"{storage:<10}{chunks:>8}{build_seconds:>10.1f}{size / 1e6:>10.1f}"
+                f"{reopen_ms:>11.1f}{statistics.median(hydrate_ms):>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Exercise EmbeddingScheduler offline against a stub embedder.
+
+Usage: uv run python benchmarks/embedding_scheduler.py --chunks 2000 --error-rate 0.1
+"""
+import argparse
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from core.embedding_scheduler import EmbeddingScheduler
+
+
+class StubEmbeddings:
+    def __init__(self, latency=0.05, error_rate=0.0, dimensions=8, seed=0):
+        self._latency = latency
+        self._error_rate = error_rate
+        self._dimensions = dimensions
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def embed_documents(self, texts):
+        time.sleep(self._latency)
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self._error_rate
+            if fail:
+                self.errors += 1
+        if fail:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED (stub)")
+        return [[float(len(text))] * self._dimensions for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    args = parser.parse_args()
+
+    docs = [SimpleNamespace(page_content=f"chunk {i}", metadata={}) for i in range(args.chunks)]
+    ids = [str(i) for i in range(args.chunks)]
+    for max_in_flight in (1, 2, 4, 8, 16):
+        embeddings = StubEmbeddings(latency=args.latency, error_rate=args.error_rate)
+        scheduler = EmbeddingScheduler(
+            embeddings,
+            batch_size=args.batch_size,
+            max_in_flight=max_in_flight,
+            requests_per_minute=args.requests_per_minute,
+            initial_backoff=0.01,
+            max_retries=10,
+        )
+        committed = []
+        start = time.perf_counter()
+        scheduler.run(zip(docs, ids), lambda _docs, batch_ids, _vectors: committed.extend(batch_ids))
+        elapsed = time.perf_counter() - start
+        assert sorted(committed, key=int) == ids
+        print(
+            f"in_flight={max_in_flight:>2}  {elapsed:6.2f}s  "
+            f"calls={embeddings.calls}  injected_errors={embeddings.errors}  "
+            f"retries={scheduler.stats['retries']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
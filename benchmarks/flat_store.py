@@ -0,0 +1,142 @@
+"""Compare the flat memory-mapped vector backend with Chroma on load time, latency and RSS.
+
+Usage: uv run python benchmarks/flat_store.py --chunks 100000 --dimensions 768
+
+Both stores are built from the same random vectors in a temporary directory.
+Each backend is then measured in a fresh process: time to open the store and
+answer the first query (cold start), p50/p95 latency over the remaining
+queries, batched query throughput for the flat store, and peak RSS of the
+process (which includes the memory-mapped pages the searches touched).
+Chroma's recall@k is reported against the flat store's exact results.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _vectors(count, dimensions, seed):
+    # Unit vectors, so Chroma's default L2 ranking matches the flat store's cosine ranking.
+    vectors = np.random.default_rng(seed).normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _open(backend, directory, dtype):
+    # Imported per backend so each measuring process only loads its own library.
+    from stub_embeddings import HashedEmbeddings
+
+    embeddings = HashedEmbeddings()
+    if backend == "flat":
+        from core.flat_store import FlatVectorStore
+
+        return FlatVectorStore(os.path.join(directory, "flat"), embeddings, dtype=dtype)
+    from langchain_chroma import Chroma
+
+    return Chroma(
+        collection_name="flat_benchmark",
+        embedding_function=embeddings,
+        persist_directory=os.path.join(directory, "chroma"),
+    )
+
+
+def _build(args, directory):
+    vectors = _vectors(args.chunks, args.dimensions, args.seed)
+    for backend in ("flat", "chroma"):
+        store = _open(backend, directory, args.dtype)
+        start = time.perf_counter()
+        for begin in range(0, args.chunks, 5000):
+            batch = vectors[begin : begin + 5000]
+            ids = [f"chunk-{i}" for i in range(begin, begin + len(batch))]
+            store._collection.upsert(
+                ids=ids,
+                embeddings=batch,
+                documents=[f"text of {chunk_id}" for chunk_id in ids],
+                metadatas=[{"source": f"note-{i // 8}.md"} for i in range(begin, begin + len(batch))],
+            )
+        print(f"Built {backend}: {args.chunks} vectors in {time.perf_counter() - start:.1f}s")
+
+
+def _measure(args):
+    queries = _vectors(args.queries, args.dimensions, args.seed + 1)
+    start = time.perf_counter()
+    store = _open(args.measure, args.dir, args.dtype)
+    first = store.similarity_search_by_vector_with_relevance_scores(queries[0].tolist(), k=args.k)
+    load = time.perf_counter() - start
+    latencies, results = [], [[doc.id for doc, _ in first]]
+    for query in queries[1:]:
+        start = time.perf_counter()
+        hits = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([doc.id for doc, _ in hits])
+    report = {
+        "load_s": load,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)],
+        "results": results,
+    }
+    if args.measure == "flat":
+        start = time.perf_counter()
+        store.similarity_search_by_vectors(queries, k=args.k)
+        report["batched_ms_per_query"] = (time.perf_counter() - start) * 1000 / len(queries)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_rss_mb"] = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", choices=["flat", "chroma"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        _measure(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        _build(args, directory)
+        reports = {}
+        for backend in ("flat", "chroma"):
+            output = subprocess.run(
+                [sys.executable, __file__, *sys.argv[1:], "--measure", backend, "--dir", directory],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            reports[backend] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'backend':<10}{'load s':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak RSS MB':>14}")
+    for backend, report in reports.items():
+        rss = report.get("peak_rss_mb")
+        print(
+            f"{backend:<10}{report['load_s']:>10.3f}{report['p50_ms']:>10.2f}{report['p95_ms']:>10.2f}"
+            f"{rss if rss is not None else float('nan'):>14.0f}"
+        )
+    print(f"flat batched search: {reports['flat']['batched_ms_per_query']:.2f} ms per query")
+    recalls = [
+        len(set(exact) & set(approximate)) / len(exact)
+        for exact, approximate in zip(reports["flat"]["results"], reports["chroma"]["results"])
+        if exact
+    ]
+    print(f"chroma recall@{args.k} vs exact: {statistics.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    main()
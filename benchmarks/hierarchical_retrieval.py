@@ -0,0 +1,110 @@
+"""Compare flat chunk search with two-stage (note summary, then chunk) search.
+
+Usage: uv run python benchmarks/hierarchical_retrieval.py --notes 20000 --queries 200
+
+The vault is synthetic: every note has its own small theme vocabulary spread
+over several sections, plus filler words shared by the whole vault. Queries
+use words from one note's theme. Recall is measured against the flat top-k
+(the share of flat results the two-stage search also returns), alongside
+p50/p95 latency of each mode and the cost of building the summary index.
+Uses the offline hashed embedder, so absolute numbers are only indicative.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from core.note_summary import note_id, summarize_note
+from core.retrieval import hierarchical_search
+from stub_embeddings import HashedEmbeddings
+
+_SYLLABLES = "ka lo mi nu pe ra si to ve za bor cel dan fir gom hul jet kin lum mar".split()
+_FILLER = "the note about meeting follow plan update review week idea list draft".split()
+
+
+def _vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(3)))
+    return sorted(words)
+
+
+def _vault(notes, sections, rng):
+    vocabulary = _vocabulary(max(2000, notes // 2), rng)
+    chunks, summaries, themes = [], [], []
+    for i in range(notes):
+        source = f"vault/note-{i}.md"
+        theme = rng.sample(vocabulary, 12)
+        themes.append(theme)
+        parts = [f"# {' '.join(theme[:2]).title()}"]
+        for s in range(sections):
+            words = [rng.choice(theme if rng.random() < 0.4 else _FILLER) for _ in range(60)]
+            body = ". ".join(" ".join(words[j : j + 12]).capitalize() for j in range(0, 60, 12)) + "."
+            parts.append(f"## {theme[s % len(theme)].title()}\n\n{body}")
+            chunks.append(Document(page_content=body, metadata={"source": source}, id=f"{source}:{s}"))
+        summaries.append(summarize_note(source, "\n\n".join(parts)))
+    return chunks, summaries, themes
+
+
+def _add(store, docs):
+    for start in range(0, len(docs), 1000):
+        batch = docs[start : start + 1000]
+        store.add_documents(batch, ids=[doc.id or note_id(doc.metadata["source"]) for doc in batch])
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--notes-k", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunks, summaries, themes = _vault(args.notes, args.sections, rng)
+    embeddings = HashedEmbeddings()
+    vector_store = Chroma(collection_name="flat_benchmark", embedding_function=embeddings)
+    note_store = Chroma(collection_name="notes_benchmark", embedding_function=embeddings)
+
+    start = time.perf_counter()
+    _add(vector_store, chunks)
+    print(f"Chunk index: {len(chunks)} vectors in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    _add(note_store, summaries)
+    print(f"Summary index: {len(summaries)} vectors in {time.perf_counter() - start:.1f}s")
+
+    queries = [" ".join(rng.sample(rng.choice(themes), 4)) for _ in range(args.queries)]
+    flat_latencies, tiered_latencies, recalls, note_hits = [], [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        flat = vector_store.similarity_search(query, k=args.k)
+        flat_latencies.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        tiered = hierarchical_search(vector_store, note_store, query, k=args.k, notes_k=args.notes_k)
+        tiered_latencies.append((time.perf_counter() - start) * 1000)
+
+        flat_ids = {doc.id for doc in flat}
+        recalls.append(len(flat_ids & {doc.id for doc in tiered}) / len(flat_ids) if flat_ids else 1.0)
+        if flat:
+            note_hits.append(flat[0].metadata["source"] in {doc.metadata["source"] for doc in tiered})
+
+    print(f"{'mode':<14}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode, latencies in (("flat", flat_latencies), ("hierarchical", tiered_latencies)):
+        p50, p95 = _percentiles(latencies)
+        print(f"{mode:<14}{p50:>10.2f}{p95:>10.2f}")
+    print(f"recall@{args.k} vs flat: {statistics.mean(recalls):.3f}")
+    print(f"flat top note kept: {statistics.mean(note_hits) if note_hits else 0.0:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Sweep Chroma HNSW parameters and embedding dimensionality against exact search.
+
+Usage: uv run python benchmarks/hnsw_sweep.py --chunks 50000 --dimensions 3072,768 --m 16,32
+
+For every combination of space, M, construction_ef, search_ef and
+dimensionality a fresh persistent collection is built and queried. The
+report lists build time, on-disk size, p50/p99 query latency and recall@k
+against exact (brute-force) search over the same vectors, followed by the
+config.json settings of the fastest combination that meets --min-recall.
+
+Vectors are clustered synthetic ones by default; pass --vectors with a saved
+.npy matrix (for example a flat backend's vectors file) to sweep real
+embeddings. Lower dimensionalities keep each vector's leading components and
+renormalize, as Matryoshka-style models such as gemini-embedding-001 do.
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_chroma import Chroma
+
+from core.rag_store import HNSW_SETTINGS
+from stub_embeddings import HashedEmbeddings
+
+
+def _normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _synthetic(count, dimensions, clusters, rng):
+    # Notes cluster by topic, which is what makes approximate search miss.
+    centers = rng.normal(size=(clusters, dimensions))
+    assignment = rng.integers(0, clusters, size=count)
+    return _normalize(centers[assignment] + 0.6 * rng.normal(size=(count, dimensions))).astype(np.float32)
+
+
+def _queries(vectors, count, rng):
+    picks = vectors[rng.integers(0, len(vectors), size=count)]
+    return _normalize(picks + 0.3 * rng.normal(size=picks.shape) / np.sqrt(picks.shape[1])).astype(np.float32)
+
+
+def _truncate(vectors, dimensions):
+    return _normalize(vectors[:, :dimensions]).astype(np.float32)
+
+
+def _exact(vectors, queries, k):
+    # Vectors are unit length, so l2 and cosine rank like inner product.
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def _disk_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def _run(vectors, queries, expected, metadata, k, directory):
+    store = Chroma(
+        collection_name="hnsw_sweep",
+        embedding_function=HashedEmbeddings(),
+        persist_directory=directory,
+        collection_metadata=metadata,
+    )
+    start = time.perf_counter()
+    for begin in range(0, len(vectors), 5000):
+        batch = vectors[begin : begin + 5000]
+        store._collection.upsert(
+            ids=[str(i) for i in range(begin, begin + len(batch))],
+            embeddings=batch,
+            documents=[f"chunk {i}" for i in range(begin, begin + len(batch))],
+            metadatas=[{"source": f"note-{i // 8}.md"} for i in range(begin, begin + len(batch))],
+        )
+    build = time.perf_counter() - start
+
+    latencies, recalls = [], []
+    for query, exact in zip(queries, expected):
+        start = time.perf_counter()
+        hits = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({int(doc.id) for doc, _ in hits} & exact) / len(exact))
+    return {
+        "build_s": build,
+        "disk_mb": _disk_size(directory) / (1024 * 1024),
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": _percentile(latencies, 0.99),
+        "recall": statistics.mean(recalls),
+    }
+
+
+def _ints(value):
+    return [int(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--vectors", help="Sweep vectors from this .npy matrix instead of synthetic ones.")
+    parser.add_argument("--dimensions", default="768", help="Comma-separated embedding sizes to compare.")
+    parser.add_argument("--space", default="cosine", help="Comma-separated: l2, cosine, ip.")
+    parser.add_argument("--m", default="16,32")
+    parser.add_argument("--construction-ef", default="100,200")
+    parser.add_argument("--search-ef", default="10,50,100")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    dimensions = _ints(args.dimensions)
+    if args.vectors:
+        base = _normalize(np.load(args.vectors, mmap_mode="r")[: args.chunks].astype(np.float32))
+        base = base[np.isfinite(base).all(axis=1)]
+    else:
+        base = _synthetic(args.chunks, max(dimensions), args.clusters, rng)
+    base_queries = _queries(base, args.queries, rng)
+    print(f"{len(base)} vectors, {args.queries} queries, k={args.k}")
+
+    header = f"{'space':<8}{'M':>5}{'c_ef':>6}{'s_ef':>6}{'dims':>6}{'build s':>9}{'disk MB':>9}{'p50 ms':>8}{'p99 ms':>8}{'recall':>8}"
+    print(header)
+    rows = []
+    for dims in dimensions:
+        vectors = _truncate(base, dims)
+        queries = _truncate(base_queries, dims)
+        expected = _exact(vectors, queries, args.k)
+        for space in args.space.split(","):
+            for m, construction_ef, search_ef in itertools.product(
+                    _ints(args.m),
+                    _ints(args.construction_ef),
+                    _ints(args.search_ef),
+            ):
+                metadata = {
+                    "hnsw:space": space,
+                    "hnsw:M": m,
+                    "hnsw:construction_ef": construction_ef,
+                    "hnsw:search_ef": search_ef,
+                }
+                with tempfile.TemporaryDirectory() as directory:
+                    result = _run(vectors, queries, expected, metadata, args.k, directory)
+                rows.append((metadata, dims, result))
+                print(
+                    f"{space:<8}{m:>5}{construction_ef:>6}{search_ef:>6}{dims:>6}"
+                    f"{result['build_s']:>9.1f}{result['disk_mb']:>9.1f}{result['p50_ms']:>8.2f}"
+                    f"{result['p99_ms']:>8.2f}{result['recall']:>8.3f}"
+                )
+
+    good = [row for row in rows if row[2]["recall"] >= args.min_recall]
+    if not good:
+        print(f"No combination reached recall {args.min_recall}; raise search_ef or M.")
+        return
+    metadata, dims, result = min(good, key=lambda row: row[2]["p99_ms"])
+    settings = {setting: metadata[key] for setting, key in HNSW_SETTINGS.items()}
+    settings["embedding_dimensions"] = dims
+    print(f"Fastest at recall >= {args.min_recall} (p99 {result['p99_ms']:.2f} ms):")
+    print(json.dumps(settings, indent=2))
+
+
+if __name__ == "__main__":
+    main()
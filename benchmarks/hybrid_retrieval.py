@@ -0,0 +1,113 @@
+"""Compare vector-only and hybrid (BM25 + vector, RRF) retrieval offline.
+
+Usage: uv run python benchmarks/hybrid_retrieval.py --notes 5000 --queries 200
+
+The corpus is synthetic. The stub embedder hashes words into a bag-of-words
+vector but drops tokens containing digits or underscores. That mimics how
+dense embeddings blur opaque identifiers (ticket ids, code names), which is
+the weakness hybrid retrieval targets. For exact queries hit@k is recall of
+the one relevant chunk; for topical queries it is the share of the top k that
+come from the queried topic. Absolute numbers are not a substitute
+for a run against a real vault and embedding model.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from core.lexical_index import LexicalIndex
+from core.retrieval import hybrid_search
+from stub_embeddings import HashedEmbeddings
+
+_TOPICS = {
+    "budget": "budget forecast spending quarter finance cost savings invoice",
+    "hiring": "hiring interview candidate recruiter offer onboarding role team",
+    "launch": "launch release rollout announcement customers marketing date",
+    "infra": "database latency outage server deploy cluster migration backup",
+    "design": "design mockup layout typography review feedback prototype",
+}
+_NAMES = ["Alice Novak", "Bram Okafor", "Chen Ruiz", "Dana Petrov", "Eli Haddad"]
+
+
+def _corpus(notes, rng):
+    docs, ids, exact_queries = [], [], []
+    by_topic = {topic: set() for topic in _TOPICS}
+    topics = list(_TOPICS)
+    for i in range(notes):
+        topic = rng.choice(topics)
+        words = _TOPICS[topic].split()
+        body = " ".join(rng.choice(words) for _ in range(60))
+        ticket = f"PROJ-{1000 + i}"
+        ident = f"sync_{topic}_{i}"
+        name = rng.choice(_NAMES)
+        text = f"{body}. Ticket {ticket} owned by {name} touches {ident}. {body[:120]}"
+        chunk_id = f"chunk-{i}"
+        docs.append(Document(page_content=text, metadata={"source": f"note-{i}.md"}))
+        ids.append(chunk_id)
+        by_topic[topic].add(chunk_id)
+        exact_queries.append((f"what is the status of {ticket}", {chunk_id}))
+        exact_queries.append((f"where is {ident} used", {chunk_id}))
+    topical_queries = []
+    for _ in range(notes):
+        topic = rng.choice(topics)
+        query = " ".join(rng.sample(_TOPICS[topic].split(), 4))
+        topical_queries.append((query, by_topic[topic]))
+    return docs, ids, exact_queries, topical_queries
+
+
+def _evaluate(search, queries, k):
+    latencies, recalls = [], []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        results = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {doc.id for doc in results[:k]}
+        if relevant:
+            recalls.append(len(found & relevant) / min(k, len(relevant)))
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    return statistics.mean(recalls) if recalls else 0.0, statistics.median(latencies), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs, ids, exact_queries, topical_queries = _corpus(args.notes, rng)
+    exact_queries = rng.sample(exact_queries, min(args.queries, len(exact_queries)))
+    topical_queries = rng.sample(topical_queries, min(args.queries, len(topical_queries)))
+
+    vector_store = Chroma(collection_name="hybrid_benchmark", embedding_function=HashedEmbeddings())
+    for start in range(0, len(docs), 1000):
+        vector_store.add_documents(docs[start : start + 1000], ids=ids[start : start + 1000])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lexical_index = LexicalIndex(str(Path(tmp) / "lexical.sqlite3"))
+        start = time.perf_counter()
+        for offset in range(0, len(docs), 1000):
+            lexical_index.upsert(ids[offset : offset + 1000], docs[offset : offset + 1000])
+        print(f"BM25 index build: {time.perf_counter() - start:.2f}s for {len(docs)} chunks")
+
+        modes = {
+            "vector": lambda query: vector_store.similarity_search(query, k=args.k),
+            "hybrid": lambda query: hybrid_search(vector_store, lexical_index, query, k=args.k),
+        }
+        print(f"{'queries':<10}{'mode':<8}{'hit@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, queries in (("exact", exact_queries), ("topical", topical_queries)):
+            for mode, search in modes.items():
+                recall, p50, p95 = _evaluate(search, queries, args.k)
+                print(f"{label:<10}{mode:<8}{recall:>10.3f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
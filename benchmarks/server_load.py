@@ -0,0 +1,166 @@
+"""Load-test the HTTP/SSE server with many concurrent clients.
+
+Usage: uv run python benchmarks/server_load.py --clients 1,8,32,128 --max-concurrency 16
+
+By default the server runs in this process on a free port with the stub
+agent (see stub_chat_model.py), in-memory session state and a temporary
+SQLite history store, so no API key is needed. Pass --url to load a running
+`serve` instead.
+
+Each client creates a session and sends --turns queries one after another,
+reading the SSE stream. The report lists turns per second, p50/p95 time to
+first token and turn latency, and the most turns /health saw running at once
+(never above --max-concurrency). A final burst sends --burst queries to one
+session at the same time and checks its history: every question must be
+followed by its own answer, with none lost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from core.rag_session import AsyncInMemorySessionStore
+from server.http_server import SessionPool, create_app
+from storage.chat_history_store import AsyncSQLiteHistoryStore
+from stub_chat_model import create_stub_agent
+
+
+async def _summarize(summary, messages):
+    return summary
+
+
+async def _events(response):
+    event = None
+    async for line in response.content:
+        line = line.decode("utf-8").rstrip("\r\n")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+async def _ask(http, url, session_id, query):
+    start = time.perf_counter()
+    first, done = None, None
+    async with http.post(f"{url}/sessions/{session_id}/query", json={"query": query}) as response:
+        response.raise_for_status()
+        async for event, data in _events(response):
+            if event == "text" and first is None:
+                first = time.perf_counter() - start
+            elif event == "error":
+                raise RuntimeError(f"Server error in {session_id}: {data['message']}")
+            elif event == "done":
+                done = data
+    if done is None:
+        raise RuntimeError(f"Stream for {session_id} ended without a done event")
+    return first or 0.0, time.perf_counter() - start
+
+
+async def _client(http, url, turns, firsts, latencies):
+    async with http.post(f"{url}/sessions") as response:
+        session_id = (await response.json())["session_id"]
+    for turn in range(turns):
+        first, latency = await _ask(http, url, session_id, f"question {turn} of {session_id}")
+        firsts.append(first)
+        latencies.append(latency)
+
+
+async def _watch(http, url, peaks, stop):
+    while not stop.is_set():
+        async with http.get(f"{url}/health") as response:
+            health = await response.json()
+        peaks.append(health["running_turns"])
+        await asyncio.sleep(0.02)
+
+
+async def _burst(http, url, count):
+    async with http.post(f"{url}/sessions") as response:
+        session_id = (await response.json())["session_id"]
+    queries = [f"burst {i}" for i in range(count)]
+    await asyncio.gather(*(_ask(http, url, session_id, query) for query in queries))
+    async with http.get(f"{url}/sessions/{session_id}/history", params={"limit": 2 * count + 10}) as response:
+        messages = (await response.json())["messages"]
+    pairs = list(zip(messages[0::2], messages[1::2]))
+    if len(messages) != 2 * count:
+        raise AssertionError(f"Burst session saved {len(messages)} messages, expected {2 * count}")
+    for question, answer in pairs:
+        if question["role"] != "user" or not answer["content"].startswith(f"Answer to {question['content']}:"):
+            raise AssertionError(f"Burst turns interleaved: {question['content']!r} -> {answer['content'][:40]!r}")
+    if sorted(question["content"] for question, _ in pairs) != sorted(queries):
+        raise AssertionError("Burst session lost or duplicated a question")
+
+
+def _p(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def _load(url, client_counts, turns, burst):
+    timeout = aiohttp.ClientTimeout(total=None)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        print(f"{'clients':<9}{'turns/s':>9}{'p50 1st':>9}{'p95 1st':>9}{'p50 turn':>10}{'p95 turn':>10}{'peak running':>14}")
+        for count in client_counts:
+            firsts, latencies, peaks = [], [], []
+            stop = asyncio.Event()
+            watcher = asyncio.create_task(_watch(http, url, peaks, stop))
+            start = time.perf_counter()
+            await asyncio.gather(*(_client(http, url, turns, firsts, latencies) for _ in range(count)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await watcher
+            print(
+                f"{count:<9}{len(latencies) / elapsed:>9.2f}{statistics.median(firsts):>9.2f}{_p(firsts, 0.95):>9.2f}"
+                f"{statistics.median(latencies):>10.2f}{_p(latencies, 0.95):>10.2f}{max(peaks, default=0):>14}"
+            )
+        await _burst(http, url, burst)
+        print(f"Burst of {burst} concurrent queries to one session: answered in order, none lost.")
+
+
+async def _serve_and_load(args):
+    with tempfile.TemporaryDirectory() as directory:
+        pool = SessionPool(
+            agent=create_stub_agent(args.latency, args.token_delay, args.tool_latency),
+            summarize=_summarize,
+            store=AsyncInMemorySessionStore(),
+            history_store=AsyncSQLiteHistoryStore(os.path.join(directory, "history.db")),
+            max_concurrency=args.max_concurrency,
+        )
+        runner = web.AppRunner(create_app(pool))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        try:
+            await _load(f"http://{host}:{port}", args.client_counts, args.turns, args.burst)
+        finally:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Load this running server instead of an in-process stub one.")
+    parser.add_argument("--clients", default="1,8,32,128")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=8)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub model time to first token, seconds.")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tool-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    args.client_counts = [int(value) for value in args.clients.split(",")]
+
+    if args.url:
+        asyncio.run(_load(args.url.rstrip("/"), args.client_counts, args.turns, args.burst))
+    else:
+        asyncio.run(_serve_and_load(args))
+
+
+if __name__ == "__main__":
+    main()
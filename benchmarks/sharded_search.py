@@ -0,0 +1,149 @@
+"""Check sharded top-k merging and measure search latency as the shard count grows.
+
+Usage: uv run python benchmarks/sharded_search.py --chunks 20000 --shards 1,2,4,8,16
+
+Chunks are assigned to shards by a hash of their note path, as with
+shard_by = "hash". The exact top k of every query is computed by brute force
+over all vectors. Recall@k against it is reported for one unsharded Chroma
+collection and for the sharded collections; HNSW is approximate, so both
+may fall slightly below 1.0. The merge check runs the same queries through
+ShardedVectorStore over exact flat-store shards, whose merged result must
+match the brute-force top k distance for distance; the run fails otherwise.
+Uses the offline hashed embedder, so absolute numbers are only indicative.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from core.flat_store import FlatVectorStore
+from core.shards import ShardedVectorStore
+from stub_embeddings import HashedEmbeddings
+
+_SYLLABLES = "ka lo mi nu pe ra si to ve za bor cel dan fir gom hul jet kin lum mar".split()
+
+
+def _chunks(count, rng):
+    vocabulary = sorted({"".join(rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(4000)})
+    docs = []
+    for i in range(count):
+        source = f"vault/folder-{i % 37}/note-{i // 4}.md"
+        words = [rng.choice(vocabulary) for _ in range(40)]
+        docs.append(Document(page_content=" ".join(words), metadata={"source": source}, id=f"chunk-{i}"))
+    return docs, vocabulary
+
+
+def _add(store, docs):
+    for start in range(0, len(docs), 1000):
+        batch = docs[start : start + 1000]
+        store.add_documents(batch, ids=[doc.id for doc in batch])
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+def _shard_of(doc, count):
+    return f"hash-{zlib.crc32(doc.metadata['source'].encode('utf-8')) % count:02d}"
+
+
+def _sharded_store(docs, count, embeddings, open_store):
+    stores = {}
+    for doc in docs:
+        stores.setdefault(_shard_of(doc, count), []).append(doc)
+    opened = {}
+    for shard, shard_docs in stores.items():
+        opened[shard] = open_store(shard)
+        _add(opened[shard], shard_docs)
+    return ShardedVectorStore(opened.get, lambda: sorted(opened), embeddings)
+
+
+def _exact_distances(matrix, embeddings, queries):
+    """Cosine distance from every query to every vector, by brute force."""
+    vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float64)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return 1.0 - vectors @ matrix.T
+
+
+def _check_merge(sharded, query, distances, row_of, k):
+    merged = [(doc.id, distance) for doc, distance in sharded.similarity_search_with_score(query, k=k)]
+    exact = np.sort(distances)[:k]
+    # Ties may come back in either order, so compare distances rank by rank and
+    # check each returned chunk really lies at the distance it was merged with.
+    if len(merged) != len(exact) or not np.allclose([distance for _, distance in merged], exact, atol=1e-4):
+        raise AssertionError(f"Sharded top {k} for {query!r} differs from the brute-force top {k}")
+    for chunk_id, distance in merged:
+        if abs(distances[row_of[chunk_id]] - distance) > 1e-4:
+            raise AssertionError(f"Sharded merge reported a wrong distance for {chunk_id} in {query!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--shards", default="1,2,4,8,16")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs, vocabulary = _chunks(args.chunks, rng)
+    embeddings = HashedEmbeddings()
+    queries = [" ".join(rng.sample(vocabulary, 4)) for _ in range(args.queries)]
+
+    matrix = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float64)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    row_of = {doc.id: row for row, doc in enumerate(docs)}
+    distances = _exact_distances(matrix, embeddings, queries)
+    exact = [{docs[row].id for row in np.argsort(row_distances, kind="stable")[:args.k]} for row_distances in distances]
+
+    def _measure(store):
+        latencies, recalls = [], []
+        for query, expected in zip(queries, exact):
+            start = time.perf_counter()
+            found = {doc.id for doc in store.similarity_search(query, k=args.k)}
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+        return _percentiles(latencies) + (statistics.mean(recalls),)
+
+    single = Chroma(collection_name="shards_single", embedding_function=embeddings)
+    start = time.perf_counter()
+    _add(single, docs)
+    print(f"Unsharded index: {len(docs)} vectors in {time.perf_counter() - start:.1f}s")
+    print(f"{'shards':<10}{'build s':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall@' + str(args.k):>12}")
+    p50, p95, recall = _measure(single)
+    print(f"{'none':<10}{'':>10}{p50:>10.2f}{p95:>10.2f}{recall:>12.3f}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(value) for value in args.shards.split(",")):
+            start = time.perf_counter()
+            sharded = _sharded_store(
+                docs,
+                count,
+                embeddings,
+                lambda shard: Chroma(collection_name=f"shards_{count}_{shard}", embedding_function=embeddings),
+            )
+            build = time.perf_counter() - start
+            p50, p95, recall = _measure(sharded)
+            print(f"{count:<10}{build:>10.1f}{p50:>10.2f}{p95:>10.2f}{recall:>12.3f}")
+
+            exact_shards = _sharded_store(
+                docs,
+                count,
+                embeddings,
+                lambda shard: FlatVectorStore(os.path.join(directory, f"{count}-{shard}"), embeddings),
+            )
+            for query, query_distances in zip(queries, distances):
+                _check_merge(exact_shards, query, query_distances, row_of, args.k)
+    print("Merge check passed: sharded exact search matched brute force for every query.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Offline chat model and agent shared by the session and server benchmarks."""
+import asyncio
+import json
+import time
+import uuid
+
+from langchain.agents import create_agent
+from langchain.tools import tool
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubChatModel(BaseChatModel):
+    """Answer every question with one retrieve_context call, then a reply quoting it.
+
+    Waits latency seconds before the first token and token_delay between
+    tokens, with asyncio.sleep on the async paths, like a remote model.
+    """
+
+    latency: float = 0.2
+    token_delay: float = 0.005
+    reply_words: int = 40
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _chunks(self, messages):
+        last = messages[-1]
+        question = next(str(message.content) for message in reversed(messages) if isinstance(message, HumanMessage))
+        if isinstance(last, HumanMessage):
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": "retrieve_context",
+                        "args": json.dumps({"query": question[:40]}),
+                        "id": f"call-{uuid.uuid4().hex[:8]}",
+                        "index": 0,
+                    }
+                ],
+            )
+            return
+        yield AIMessageChunk(content=f"Answer to {question}: ")
+        for i in range(self.reply_words):
+            yield AIMessageChunk(content=f"word{i} ")
+
+    def _message(self, messages):
+        chunks = list(self._chunks(messages))
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged += chunk
+        return AIMessage(content=merged.content, tool_calls=merged.tool_calls)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._message(messages)
+        time.sleep(self.latency + self.token_delay * len(str(message.content).split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._message(messages)
+        await asyncio.sleep(self.latency + self.token_delay * len(str(message.content).split()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+            time.sleep(self.token_delay)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+            await asyncio.sleep(self.token_delay)
+
+
+def create_stub_agent(latency=0.2, token_delay=0.005, tool_latency=0.02):
+    """Agent with the real agent's tool-calling shape; the search blocks like a local vector store."""
+
+    @tool(response_format="content_and_artifact")
+    def retrieve_context(query: str):
+        """Retrieve information related to a query."""
+        time.sleep(tool_latency)
+        doc = Document(page_content=f"Notes about {query}", metadata={"source": "stub.md"})
+        return doc.page_content, [doc]
+
+    model = StubChatModel(latency=latency, token_delay=token_delay)
+    return create_agent(model, [retrieve_context], system_prompt="Answer from the vault.")
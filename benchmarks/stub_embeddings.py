@@ -0,0 +1,33 @@
+"""Deterministic offline embedder shared by the retrieval benchmarks."""
+import hashlib
+import math
+
+from langchain_core.embeddings import Embeddings
+
+
+class HashedEmbeddings(Embeddings):
+    """Hash words into a normalized bag-of-words vector.
+
+    Tokens containing digits or underscores are dropped, mimicking how dense
+    embeddings blur opaque identifiers such as ticket ids and code names.
+    """
+
+    def __init__(self, dimensions=256):
+        self._dimensions = dimensions
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def _embed(self, text):
+        vector = [0.0] * self._dimensions
+        for word in text.lower().split():
+            word = word.strip(".,?!:;()")
+            if not word or any(ch.isdigit() or ch == "_" for ch in word):
+                continue
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+            vector[int.from_bytes(digest, "little") % self._dimensions] += 1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
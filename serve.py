@@ -0,0 +1,5 @@
+from src.cli.serve import main
+
+
+if __name__ == "__main__":
+    main()
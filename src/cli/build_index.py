@@ -1,27 +1,26 @@
-from langchain_community.document_loaders import (
-    DirectoryLoader,
-    UnstructuredMarkdownLoader, TextLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
-
 import argparse
-import hashlib
-from collections import defaultdict
+import os
+import sys
 
 from core.config import get_setting, load_env
-from core.rag_store import get_vector_store
-
+from core.index_pipeline import create_vault_indexer
+from core.rag_store import get_sharded_vector_store, get_vector_store
+from core.shards import sharding_mode
+from core.vault_watcher import watch_vault
 
-def _doc_id(doc) -> str:
-    source = doc.metadata.get("source", "")
-    start = doc.metadata.get("start_index", "")
-    payload = f"{source}:{start}:{doc.page_content}"
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+try:
+    import resource
+except ImportError:
+    resource = None
 
 
-def _chunked(items, size):
-    for i in range(0, len(items), size):
-        yield items[i : i + size]
+def _peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / scale
 
 
 def main():
@@ -29,92 +28,144 @@ def main():
     parser.add_argument(
         "--reindex",
         action="store_true",
-        help="Delete the existing collection and rebuild from scratch.",
+        help="Re-embed every note in place (resumable if interrupted).",
+    )
+    parser.add_argument(
+        "--recreate-collection",
+        action="store_true",
+        help="Recreate the Chroma collections with the current hnsw_* settings and re-embed every note.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to read and split notes (0 uses all CPUs).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Chunks per embedding request (defaults to embedding_batch_size).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Concurrent embedding requests (defaults to embedding_max_in_flight).",
+    )
+    parser.add_argument(
+        "--shard",
+        action="append",
+        default=None,
+        help="Only sync this shard (repeatable; needs shard_by). With --reindex, re-embeds just that shard.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-index notes as they change on disk.",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="With --watch, poll the vault instead of using filesystem events.",
     )
     args = parser.parse_args()
 
     load_env()
     vault_path = get_setting("vault_path", required=True)
-    loader = DirectoryLoader(
-        vault_path,
-        glob="**/*.md",
-        loader_cls=TextLoader,
-        recursive=True,
-        show_progress=True,
-    )
-    docs = loader.load()
-
-    markdown_splitter = MarkdownHeaderTextSplitter(headers_to_split_on=[("##", "Header 2"), ("###", "Header 3")])
-
-    markdown_splits = []
-    for doc in docs:
-        markdown_split = markdown_splitter.split_text(doc.page_content)
-        for split in markdown_split:
-            split.metadata.update(doc.metadata)
-        markdown_splits.extend(markdown_split)
-
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        add_start_index=True,
+    if args.shard and not sharding_mode():
+        parser.error("--shard needs shard_by set to folder or hash.")
+    if args.recreate_collection and get_setting("vector_backend", default="chroma") != "chroma":
+        parser.error("--recreate-collection only applies to the Chroma backend.")
+    vector_store = get_sharded_vector_store(vault_path) if sharding_mode() else get_vector_store()
+    indexer = create_vault_indexer(
+        vector_store,
+        workers=args.workers if args.workers > 0 else (os.cpu_count() or 1),
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
     )
-    all_splits = text_splitter.split_documents(markdown_splits)
-
-    vector_store = get_vector_store()
-    if args.reindex:
-        vector_store.delete_collection()
-        vector_store = get_vector_store()
-
-    existing_ids = set()
-    existing_by_source = defaultdict(set)
-    if vector_store._collection.count() > 0:
-        result = vector_store._collection.get(include=["metadatas"])
-        ids = result.get("ids", [])
-        metadatas = result.get("metadatas", [])
-        for doc_id, metadata in zip(ids, metadatas):
-            existing_ids.add(doc_id)
-            source = None
-            if metadata:
-                source = metadata.get("source")
-            existing_by_source[source].add(doc_id)
-
-    new_docs = []
-    new_ids = []
-    new_by_source = defaultdict(set)
-    for doc in all_splits:
-        doc_id = _doc_id(doc)
-        source = doc.metadata.get("source")
-        new_by_source[source].add(doc_id)
-        if doc_id not in existing_ids and doc_id not in new_ids:
-            new_docs.append(doc)
-            new_ids.append(doc_id)
-
-    stale_ids = []
-    for source, ids in existing_by_source.items():
-        current_ids = new_by_source.get(source)
-        if not current_ids:
-            stale_ids.extend(ids)
-            continue
-        stale_ids.extend(list(ids - current_ids))
-
-    deleted_count = 0
-    if stale_ids:
-        for batch in _chunked(stale_ids, 200):
-            vector_store._collection.delete(ids=batch)
-            deleted_count += len(batch)
-
-    if not new_docs:
-        if deleted_count == 0:
-            print("No changes detected.")
-        else:
-            print(f"Removed {deleted_count} stale chunks from Chroma.")
-        return
-
-    document_ids = vector_store.add_documents(documents=new_docs, ids=new_ids)
-    print(f"Added {len(document_ids)} chunks to Chroma.")
-    if deleted_count:
-        print(f"Removed {deleted_count} stale chunks from Chroma.")
+    if args.shard:
+        if indexer.reindex_pending(args.shard):
+            print("Resuming interrupted reindex.")
+        stats = indexer.sync_vault(
+            vault_path,
+            reindex=args.reindex,
+            shards=args.shard,
+            recreate_collection=args.recreate_collection,
+        )
+    else:
+        if indexer.reindex_pending():
+            print("Resuming interrupted reindex.")
+        stats = indexer.sync_vault(vault_path, reindex=args.reindex, recreate_collection=args.recreate_collection)
+
+    retries = indexer.scheduler.stats["retries"]
+    if retries:
+        print(f"Retried {retries} embedding requests.")
+    cache_stats = getattr(vector_store.embeddings, "stats", None)
+    if cache_stats and (cache_stats["hits"] or cache_stats["misses"]):
+        print(
+            f"Embedding cache: {cache_stats['hits']} hits, "
+            f"{cache_stats['misses']} misses."
+        )
+
+    if not (stats["chunks_added"] or stats["chunks_deleted"] or stats["chunks_deduplicated"]):
+        print("No changes detected.")
+    if stats["chunks_added"]:
+        print(f"Added {stats['chunks_added']} chunks to Chroma.")
+    if stats["chunks_deleted"]:
+        print(f"Removed {stats['chunks_deleted']} stale chunks from Chroma.")
+    if stats["chunks_deduplicated"]:
+        print(f"Skipped embedding {stats['chunks_deduplicated']} near-duplicate chunks.")
+    dedup_index = indexer.dedup_index
+    if dedup_index is not None:
+        members, clusters = dedup_index.count()
+        if members:
+            print(
+                f"Near-duplicate dedup: {members} embeddings saved in total "
+                f"({clusters} clusters share one vector each)."
+            )
+
+    peak_self = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+    if peak_self is not None:
+        summary = f"Scanned {stats['files_scanned']} files, peak RSS {peak_self:.0f} MB"
+        peak_children = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+        if peak_children:
+            summary += f" (largest worker {peak_children:.0f} MB)"
+        print(summary + ".")
+
+    if args.watch:
+        _watch(vault_path, indexer, use_polling=args.poll)
+
+
+def _watch(vault_path, indexer, use_polling=False):
+    def _on_batch(batch):
+        before = dict(indexer.stats)
+        try:
+            stats = indexer.sync_paths(batch.changed, batch.deleted, batch.moved)
+        except Exception as e:
+            print(f"Error indexing changes: {e}")
+            return
+        delta = {key: stats[key] - before.get(key, 0) for key in stats if key in before}
+        print(
+            f"Indexed {delta['files_changed']} changed, {delta['files_renamed']} renamed, "
+            f"{delta['files_deleted']} deleted notes "
+            f"(+{delta['chunks_added']} / -{delta['chunks_deleted']} chunks, "
+            f"{delta['chunks_reused']} reused)."
+        )
+
+    print(f"Watching {vault_path} for changes. Press Ctrl+C to stop.")
+    try:
+        watch_vault(
+            vault_path,
+            _on_batch,
+            debounce=get_setting("watch_debounce_seconds", default=1.5),
+            poll_interval=get_setting("watch_poll_interval_seconds", default=2.0),
+            use_polling=use_polling,
+            known_sources=indexer.sources_under,
+        )
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
@@ -1,14 +1,15 @@
 import shutil
 import uuid
 
+from core.rag_agent import file_cache
 from core.rag_session import create_session
 from storage.chat_history_store import create_history_store
 from input.chat_input import read_user_input
 from sessions.chat_sessions import choose_session, restore_session_history, render_history
 from ui.chat_ui import (
+    StreamingAssistantBox,
     clear_last_lines,
     print_banner,
-    render_assistant,
     render_sources,
     set_term_width,
     start_typing_indicator,
@@ -36,20 +37,34 @@ def main():
 
         typing_stop, typing_thread, typing_lines = start_typing_indicator()
         typing_cleared = False
-        last_text, artifacts = session.process_query(query)
-        if last_text:
-            typing_stop.set()
-            typing_thread.join(timeout=0.5)
-            clear_last_lines(typing_lines)
-            typing_cleared = True
-            render_assistant(last_text)
+        assistant_box = StreamingAssistantBox()
+        last_text, artifacts = "", []
+        for event in session.stream_query(query):
+            if event["type"] == "text":
+                if not typing_cleared:
+                    # The first token replaces the spinner with the reply box.
+                    typing_stop.set()
+                    typing_thread.join(timeout=0.5)
+                    clear_last_lines(typing_lines)
+                    typing_cleared = True
+                assistant_box.update(event["text"])
+            elif event["type"] == "done":
+                last_text, artifacts = event["text"], event["artifacts"]
         typing_stop.set()
         typing_thread.join(timeout=0.5)
         if not typing_cleared:
             clear_last_lines(typing_lines)
+        assistant_box.finish(last_text)
         if artifacts:
             render_sources(artifacts)
 
+    cache_stats = file_cache.stats
+    if cache_stats["hits"] or cache_stats["misses"]:
+        print(
+            f"Note cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate)."
+        )
+
 
 if __name__ == "__main__":
     main()
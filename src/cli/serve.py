@@ -0,0 +1,35 @@
+import argparse
+
+from aiohttp import web
+
+from core.config import get_setting
+from server.http_server import SessionPool, create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the vault agent over HTTP with SSE-streamed replies.")
+    parser.add_argument("--host", default=get_setting("serve_host", default="127.0.0.1"))
+    parser.add_argument("--port", type=int, default=get_setting("serve_port", default=8080))
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=get_setting("serve_max_concurrency", default=8),
+        help="Maximum number of turns answered at once; further requests wait their turn.",
+    )
+    args = parser.parse_args()
+
+    # Built once here: every session shares this model, vector store and tool set.
+    from core import rag_agent
+
+    pool = SessionPool(
+        agent=rag_agent.agent,
+        summarize=rag_agent.asummarize_messages,
+        max_concurrency=args.max_concurrency,
+        max_sessions=get_setting("serve_max_sessions", default=10000),
+        history_max_messages=get_setting("history_max_messages", default=30),
+    )
+    web.run_app(create_app(pool), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from array import array
+
+from langchain_core.documents import Document
+
+from core.config import get_setting
+from core.embedding_cache import normalize_text
+from core.lexical_index import where_sql
+from core.note_metadata import FOLDER_PREFIX, TAG_PREFIX
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_BINS = 64
+_ROWS = 4
+_BIN_SHIFT = 58
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+
+
+def minhash(text):
+    """One-permutation MinHash over word 3-shingles of the normalized text.
+
+    Each shingle is hashed once; the top bits pick one of 64 bins and the
+    rest compete for that bin's minimum. Empty bins borrow from the next
+    filled bin (offset by distance), so short chunks still compare fairly.
+    Returns None for text without words.
+    """
+    words = _WORD_RE.findall(normalize_text(text).lower())
+    if not words:
+        return None
+    if len(words) < 3:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i : i + 3]) for i in range(len(words) - 2)}
+    bins = [None] * _BINS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        index, value = value >> _BIN_SHIFT, value & _VALUE_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    signature = []
+    for index in range(_BINS):
+        distance = 0
+        while bins[(index + distance) % _BINS] is None:
+            distance += 1
+        signature.append(bins[(index + distance) % _BINS] + (distance << _BIN_SHIFT))
+    return signature
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(a, b)) / _BINS
+
+
+def _band_keys(signature):
+    # 16 bands of 4 bins: pairs with Jaccard 0.8 share a band with
+    # probability ~0.9998, unrelated chunks practically never do.
+    keys = []
+    for band in range(_BINS // _ROWS):
+        values = array("Q", signature[band * _ROWS : (band + 1) * _ROWS]).tobytes()
+        digest = hashlib.blake2b(bytes([band]) + values, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def _placeholders(items):
+    return ",".join("?" for _ in items)
+
+
+class DedupIndex:
+    """Near-duplicate chunk clusters, backed by SQLite.
+
+    Each cluster is represented in Chroma by its canonical chunk only. The
+    other members keep their text and metadata here so they can be promoted
+    when the canonical chunk goes away, and expanded back at query time.
+    Candidates are found through indexed MinHash band keys and accepted when
+    their estimated Jaccard similarity reaches the threshold.
+    """
+
+    def __init__(self, path, threshold=0.8, min_words=8):
+        self._path = path
+        self._threshold = threshold
+        self._min_words = min_words
+        self._ensure_schema()
+
+    def count(self):
+        """Return (members, clusters): members is the number of embeddings saved."""
+        with sqlite3.connect(self._path) as conn:
+            members = conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+            clusters = conn.execute(
+                "SELECT COUNT(DISTINCT cluster_id) FROM members"
+            ).fetchone()[0]
+        return members, clusters
+
+    def clear(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("DELETE FROM clusters")
+            conn.execute("DELETE FROM cluster_bands")
+            conn.execute("DELETE FROM members")
+            conn.commit()
+
+    def classify(self, items):
+        """Split (doc, chunk_id) pairs into (to_embed, duplicates).
+
+        New near-duplicates are recorded as members of an existing cluster;
+        duplicates holds (doc, chunk_id, cluster_id) for every member.
+        """
+        to_embed, duplicates = [], []
+        ids = [chunk_id for _, chunk_id in items]
+        with sqlite3.connect(self._path) as conn:
+            members, canonical = {}, set()
+            for i in range(0, len(ids), 500):
+                batch = ids[i : i + 500]
+                members.update(conn.execute(
+                    f"SELECT chunk_id, cluster_id FROM members WHERE chunk_id IN ({_placeholders(batch)})",
+                    batch,
+                ).fetchall())
+                canonical.update(row[0] for row in conn.execute(
+                    f"SELECT cluster_id FROM clusters WHERE cluster_id IN ({_placeholders(batch)})",
+                    batch,
+                ))
+            for doc, chunk_id in items:
+                if chunk_id in members:
+                    duplicates.append((doc, chunk_id, members[chunk_id]))
+                    continue
+                if chunk_id in canonical:
+                    to_embed.append((doc, chunk_id))
+                    continue
+                signature = minhash(doc.page_content)
+                if signature is None:
+                    to_embed.append((doc, chunk_id))
+                    continue
+                # Short chunks only merge when identical, near matches are noise.
+                exact = len(_WORD_RE.findall(doc.page_content)) < self._min_words
+                cluster_id = self._find(conn, signature, 1.0 if exact else self._threshold)
+                if cluster_id is None:
+                    self._add_cluster(conn, chunk_id, signature, doc.metadata)
+                    to_embed.append((doc, chunk_id))
+                    continue
+                self._add_member(conn, chunk_id, cluster_id, doc)
+                duplicates.append((doc, chunk_id, cluster_id))
+            conn.commit()
+        return to_embed, duplicates
+
+    def update(self, items):
+        """Store new metadata for known chunks; return (member ids, cluster ids affected)."""
+        members, touched = set(), set()
+        with sqlite3.connect(self._path) as conn:
+            for doc, chunk_id in items:
+                metadata = json.dumps(doc.metadata)
+                row = conn.execute(
+                    "SELECT cluster_id FROM members WHERE chunk_id = ?",
+                    (chunk_id,),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE members SET metadata = ? WHERE chunk_id = ?",
+                        (metadata, chunk_id),
+                    )
+                    members.add(chunk_id)
+                    touched.add(row[0])
+                    continue
+                cursor = conn.execute(
+                    "UPDATE clusters SET metadata = ? WHERE cluster_id = ?",
+                    (metadata, chunk_id),
+                )
+                if cursor.rowcount:
+                    touched.add(chunk_id)
+            conn.commit()
+        return members, touched
+
+    def remove(self, ids):
+        """Forget chunks; return (touched cluster ids, promotions).
+
+        A removed canonical chunk with remaining members hands its cluster to
+        one of them; promotions lists (old_id, Document) with the new
+        canonical's id, text and metadata, which must replace the old row.
+        """
+        ids = list(ids)
+        touched, promotions = set(), []
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(ids), 500):
+                batch = ids[i : i + 500]
+                touched.update(row[0] for row in conn.execute(
+                    f"SELECT cluster_id FROM members WHERE chunk_id IN ({_placeholders(batch)})",
+                    batch,
+                ))
+                conn.execute(f"DELETE FROM members WHERE chunk_id IN ({_placeholders(batch)})", batch)
+            for i in range(0, len(ids), 500):
+                batch = ids[i : i + 500]
+                removed = conn.execute(
+                    f"SELECT cluster_id, signature FROM clusters WHERE cluster_id IN ({_placeholders(batch)})",
+                    batch,
+                ).fetchall()
+                conn.execute(f"DELETE FROM clusters WHERE cluster_id IN ({_placeholders(batch)})", batch)
+                for old_id, signature in removed:
+                    touched.discard(old_id)
+                    heir = conn.execute(
+                        "SELECT chunk_id, content, metadata FROM members WHERE cluster_id = ? LIMIT 1",
+                        (old_id,),
+                    ).fetchone()
+                    if heir is None:
+                        conn.execute("DELETE FROM cluster_bands WHERE cluster_id = ?", (old_id,))
+                        continue
+                    new_id, content, metadata = heir
+                    conn.execute(
+                        "INSERT OR REPLACE INTO clusters (cluster_id, signature, metadata) VALUES (?, ?, ?)",
+                        (new_id, signature, metadata),
+                    )
+                    conn.execute(
+                        "UPDATE cluster_bands SET cluster_id = ? WHERE cluster_id = ?",
+                        (new_id, old_id),
+                    )
+                    conn.execute("DELETE FROM members WHERE chunk_id = ?", (new_id,))
+                    conn.execute(
+                        "UPDATE members SET cluster_id = ? WHERE cluster_id = ?",
+                        (new_id, old_id),
+                    )
+                    promotions.append((
+                        old_id,
+                        Document(page_content=content, metadata=json.loads(metadata), id=new_id),
+                    ))
+                    touched.add(new_id)
+            conn.commit()
+        return touched, promotions
+
+    def cluster_metadata(self, cluster_ids):
+        """Metadata to merge into each canonical row: member count plus members' tags and folders.
+
+        The boolean tag and folder keys of every member are merged in, so a
+        filtered search still finds a cluster through any of its members.
+        """
+        extra = {}
+        cluster_ids = list(cluster_ids)
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(cluster_ids), 500):
+                batch = cluster_ids[i : i + 500]
+                rows = conn.execute(
+                    f"SELECT cluster_id, metadata FROM members WHERE cluster_id IN ({_placeholders(batch)})",
+                    batch,
+                )
+                for cluster_id, metadata in rows:
+                    entry = extra.setdefault(cluster_id, {"duplicates": 0})
+                    entry["duplicates"] += 1
+                    for key, value in json.loads(metadata).items():
+                        if value is True and key.startswith((TAG_PREFIX, FOLDER_PREFIX)):
+                            entry[key] = True
+        return extra
+
+    def canonical_metadata(self, cluster_ids):
+        """Return {cluster_id: the canonical chunk's own metadata}."""
+        found = {}
+        cluster_ids = list(cluster_ids)
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(cluster_ids), 500):
+                batch = cluster_ids[i : i + 500]
+                rows = conn.execute(
+                    f"SELECT cluster_id, metadata FROM clusters WHERE cluster_id IN ({_placeholders(batch)})",
+                    batch,
+                )
+                found.update((cluster_id, json.loads(metadata)) for cluster_id, metadata in rows)
+        return found
+
+    def members(self, cluster_ids, where=None):
+        """Return {cluster_id: [member Document]} for members matching an optional where clause."""
+        found = {}
+        cluster_ids = list(cluster_ids)
+        filter_sql, filter_params = where_sql(where, "m.metadata") if where else ("1", [])
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(cluster_ids), 500):
+                batch = cluster_ids[i : i + 500]
+                rows = conn.execute(
+                    f"""
+                    SELECT m.chunk_id, m.cluster_id, m.content, m.metadata
+                    FROM members m
+                    WHERE m.cluster_id IN ({_placeholders(batch)}) AND {filter_sql}
+                    ORDER BY m.source
+                    """,
+                    [*batch, *filter_params],
+                )
+                for chunk_id, cluster_id, content, metadata in rows:
+                    found.setdefault(cluster_id, []).append(
+                        Document(page_content=content, metadata=json.loads(metadata), id=chunk_id)
+                    )
+        return found
+
+    def iter_members(self, page_size=500):
+        """Yield every member as lists of up to page_size Documents."""
+        last = ""
+        while True:
+            with sqlite3.connect(self._path) as conn:
+                rows = conn.execute(
+                    "SELECT chunk_id, content, metadata FROM members WHERE chunk_id > ? ORDER BY chunk_id LIMIT ?",
+                    (last, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [
+                Document(page_content=content, metadata=json.loads(metadata), id=chunk_id)
+                for chunk_id, content, metadata in rows
+            ]
+
+    def matching_clusters(self, cluster_ids, where):
+        """Return the cluster ids whose canonical chunk itself matches where."""
+        cluster_ids = list(cluster_ids)
+        filter_sql, filter_params = where_sql(where, "c.metadata")
+        found = set()
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(cluster_ids), 500):
+                batch = cluster_ids[i : i + 500]
+                found.update(row[0] for row in conn.execute(
+                    f"""
+                    SELECT c.cluster_id FROM clusters c
+                    WHERE c.cluster_id IN ({_placeholders(batch)}) AND {filter_sql}
+                    """,
+                    [*batch, *filter_params],
+                ))
+        return found
+
+    def _find(self, conn, signature, threshold):
+        keys = _band_keys(signature)
+        rows = conn.execute(
+            f"""
+            SELECT c.cluster_id, c.signature FROM clusters c
+            WHERE c.cluster_id IN (
+                SELECT cluster_id FROM cluster_bands WHERE band_key IN ({_placeholders(keys)})
+            )
+            """,
+            keys,
+        )
+        best, best_similarity = None, threshold
+        for cluster_id, other in rows:
+            score = similarity(signature, array("Q", other))
+            if score >= best_similarity:
+                best, best_similarity = cluster_id, score
+        return best
+
+    def _add_cluster(self, conn, chunk_id, signature, metadata):
+        conn.execute(
+            "INSERT OR REPLACE INTO clusters (cluster_id, signature, metadata) VALUES (?, ?, ?)",
+            (chunk_id, array("Q", signature).tobytes(), json.dumps(metadata)),
+        )
+        conn.execute("DELETE FROM cluster_bands WHERE cluster_id = ?", (chunk_id,))
+        conn.executemany(
+            "INSERT INTO cluster_bands (band_key, cluster_id) VALUES (?, ?)",
+            [(key, chunk_id) for key in _band_keys(signature)],
+        )
+
+    def _add_member(self, conn, chunk_id, cluster_id, doc):
+        conn.execute(
+            "INSERT OR REPLACE INTO members (chunk_id, cluster_id, source, content, metadata) VALUES (?, ?, ?, ?, ?)",
+            (
+                chunk_id,
+                cluster_id,
+                doc.metadata.get("source", ""),
+                doc.page_content,
+                json.dumps(doc.metadata),
+            ),
+        )
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS clusters (
+                        cluster_id TEXT PRIMARY KEY,
+                        signature BLOB NOT NULL,
+                        metadata TEXT NOT NULL
+                    )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS cluster_bands (
+                        band_key INTEGER NOT NULL,
+                        cluster_id TEXT NOT NULL
+                    )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS members (
+                        chunk_id TEXT PRIMARY KEY,
+                        cluster_id TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        metadata TEXT NOT NULL
+                    )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS bands_by_key ON cluster_bands (band_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS bands_by_cluster ON cluster_bands (cluster_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS members_by_cluster ON members (cluster_id)")
+            conn.commit()
+
+
+def create_dedup_index(directory=None):
+    if not get_setting("chunk_dedup", default=False):
+        return None
+    path = None if directory else get_setting("chunk_dedup_path")
+    if not path:
+        persist_dir = directory or get_setting("chroma_persist_dir", required=True)
+        path = os.path.join(persist_dir, "chunk_dedup.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return DedupIndex(
+        path,
+        threshold=get_setting("chunk_dedup_threshold", default=0.8),
+        min_words=get_setting("chunk_dedup_min_words", default=8),
+    )
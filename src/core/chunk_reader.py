@@ -0,0 +1,98 @@
+import hashlib
+import mmap
+import os
+
+from langchain_core.documents import Document
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_offsets(text, chunks):
+    """Return the (byte_start, byte_end) of each chunk in text, or None when it is not a verbatim slice.
+
+    Chunks are expected in document order, possibly overlapping.
+    """
+    offsets = []
+    search_from = 0
+    char_anchor = byte_anchor = 0
+    for chunk in chunks:
+        start = text.find(chunk, search_from)
+        if start == -1:
+            start = text.find(chunk)
+        if not chunk or start == -1:
+            offsets.append(None)
+            continue
+        # Walk the byte position from the previous chunk instead of
+        # re-encoding the prefix, which keeps this linear in the note size.
+        if start >= char_anchor:
+            byte_anchor += len(text[char_anchor:start].encode("utf-8"))
+        else:
+            byte_anchor -= len(text[start:char_anchor].encode("utf-8"))
+        char_anchor = start
+        offsets.append((byte_anchor, byte_anchor + len(chunk.encode("utf-8"))))
+        search_from = start + 1
+    return offsets
+
+
+def add_offsets(text, docs):
+    """Record byte offsets and a content hash in each chunk's metadata."""
+    for doc, offsets in zip(docs, chunk_offsets(text, [doc.page_content for doc in docs])):
+        doc.metadata["chunk_hash"] = text_hash(doc.page_content)
+        if offsets is not None:
+            doc.metadata["byte_start"], doc.metadata["byte_end"] = offsets
+    return docs
+
+
+def _read_slices(path, spans):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return [b"" for _ in spans]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return [mapped[start:end] for start, end in spans]
+
+
+def hydrate_chunks(docs, resolve_path=None):
+    """Fill in page_content for chunks stored as offsets only.
+
+    The text is sliced from the note through mmap and checked against the
+    stored hash; chunks whose note changed since indexing are dropped.
+    """
+    pending = {}
+    for position, doc in enumerate(docs):
+        if doc.page_content or "byte_start" not in doc.metadata:
+            continue
+        pending.setdefault(doc.metadata.get("source"), []).append(position)
+    if not pending:
+        return docs
+
+    stale = set()
+    texts = {}
+    for source, positions in pending.items():
+        path = resolve_path(source) if resolve_path else source
+        spans = [(docs[i].metadata["byte_start"], docs[i].metadata["byte_end"]) for i in positions]
+        try:
+            slices = _read_slices(path, spans)
+        except (OSError, ValueError) as e:
+            print(f"Error reading file {source}: {e}")
+            stale.update(positions)
+            continue
+        for i, data in zip(positions, slices):
+            text = data.decode("utf-8", errors="replace")
+            if text_hash(text) != docs[i].metadata.get("chunk_hash"):
+                stale.add(i)
+            else:
+                texts[i] = text
+    if stale:
+        print(f"Skipped {len(stale)} stale chunks; run build_index to refresh them.")
+
+    hydrated = []
+    for position, doc in enumerate(docs):
+        if position in stale:
+            continue
+        if position in texts:
+            doc = Document(page_content=texts[position], metadata=doc.metadata, id=doc.id)
+        hydrated.append(doc)
+    return hydrated
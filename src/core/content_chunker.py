@@ -0,0 +1,79 @@
+import re
+import zlib
+
+from langchain_core.documents import Document
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+
+def _sections(text):
+    """Yield (headers, lines) for each heading-delimited section, ignoring fenced code."""
+    headers = {}
+    lines = []
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line.rstrip("\n"))
+        if match:
+            if lines:
+                yield dict(headers), lines
+            level = len(match.group(1))
+            headers = {k: v for k, v in headers.items() if k < level}
+            headers[level] = match.group(2)
+            lines = [line]
+            continue
+        lines.append(line)
+    if lines:
+        yield dict(headers), lines
+
+
+def _split_long_line(line, max_size):
+    while len(line) > max_size:
+        cut = line.rfind(" ", 0, max_size)
+        if cut <= 0:
+            cut = max_size
+        yield line[:cut]
+        line = line[cut:]
+    if line:
+        yield line
+
+
+def split_content_defined(text, min_size=400, target_size=1000, max_size=2000):
+    """Split text at headings and at lines whose own hash selects a cut point.
+
+    Cuts never depend on absolute offsets, so boundaries resynchronise shortly
+    after an edit instead of shifting for the rest of the note.
+    """
+    spread = max(1, target_size - min_size)
+    for headers, lines in _sections(text):
+        current = []
+        size = 0
+        for raw_line in lines:
+            for line in _split_long_line(raw_line, max_size):
+                if size and size + len(line) > max_size:
+                    yield headers, "".join(current)
+                    current, size = [], 0
+                current.append(line)
+                size += len(line)
+                stripped = line.strip()
+                if size >= min_size and stripped:
+                    if zlib.crc32(stripped.encode("utf-8")) % spread < len(line):
+                        yield headers, "".join(current)
+                        current, size = [], 0
+        if current and "".join(current).strip():
+            yield headers, "".join(current)
+
+
+def split_note_content_defined(source, text):
+    docs = []
+    for headers, chunk in split_content_defined(text):
+        content = chunk.strip()
+        if not content:
+            continue
+        metadata = {"source": source}
+        for level, title in headers.items():
+            metadata[f"Header {level}"] = title
+        docs.append(Document(page_content=content, metadata=metadata))
+    return docs
@@ -0,0 +1,220 @@
+import re
+
+_HEADING_RE = re.compile(r"(#{1,6})\s")
+_FENCE_RE = re.compile(r"\s*(```|~~~)")
+_SEPARATOR = "=" * 30
+_TRUNCATED = "\n[... truncated]"
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose and markdown.
+    return (len(text) + 3) // 4
+
+
+def _locate(text, chunk):
+    """Return the (start, end) span of chunk inside text, or None."""
+    start = text.find(chunk)
+    if start != -1:
+        return start, start + len(chunk)
+    # Header splitting rejoins lines, so fall back to the first and last lines.
+    lines = [line.strip() for line in chunk.splitlines() if line.strip()]
+    if not lines:
+        return None
+    start = text.find(lines[0])
+    if start == -1:
+        return None
+    end = text.find(lines[-1], start)
+    end = start + len(lines[0]) if end == -1 else end + len(lines[-1])
+    return start, end
+
+
+def _headings(text):
+    """(position, level) of every markdown heading, skipping fenced code blocks."""
+    headings = []
+    in_fence = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING_RE.match(line)
+            if match:
+                headings.append((position, len(match.group(1))))
+        position += len(line)
+    return headings
+
+
+def _section_span(text, start, end):
+    headings = _headings(text)
+    section_start, level = 0, 0
+    for position, heading_level in headings:
+        if position > start:
+            break
+        section_start, level = position, heading_level
+    section_end = len(text)
+    for position, heading_level in headings:
+        if position >= end and (level == 0 or heading_level <= level):
+            section_end = position
+            break
+    return section_start, section_end
+
+
+def _merge(spans):
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _excerpt_spans(text, chunks, neighbour_chars, section_tokens):
+    spans = []
+    for chunk in chunks:
+        located = _locate(text, chunk)
+        if located is None:
+            continue
+        start, end = located
+        section_start, section_end = _section_span(text, start, end)
+        if estimate_tokens(text[section_start:section_end]) <= section_tokens:
+            spans.append((section_start, section_end))
+            continue
+        spans.append((
+            max(section_start, start - neighbour_chars),
+            min(section_end, end + neighbour_chars),
+        ))
+    return _merge(spans)
+
+
+def _render_excerpts(text, spans):
+    parts = []
+    for start, end in spans:
+        if start > 0:
+            parts.append("[...]")
+        parts.append(text[start:end].strip("\n"))
+    if spans and spans[-1][1] < len(text):
+        parts.append("[...]")
+    return "\n".join(parts)
+
+
+def _truncate(text, tokens):
+    limit = max(0, tokens * 4)
+    if len(text) <= limit:
+        return text
+    # The marker counts against the budget too.
+    keep = limit - len(_TRUNCATED)
+    if keep <= 0:
+        return text[:limit]
+    return text[:keep].rstrip() + _TRUNCATED
+
+
+def assemble_context(
+        docs,
+        read_file,
+        token_budget=8000,
+        neighbour_chunks=1,
+        chunk_chars=1000,
+        section_tokens=1500,
+):
+    """Build tool context from ranked hits within token_budget.
+
+    Every hit note first gets its matched chunks with their heading section
+    (or neighbouring text when the section is large); notes are then upgraded
+    to their full text in rank order while the budget allows. Docs with empty
+    page_content (e.g. linked neighbour notes) contribute the note's opening.
+    Returns (serialized, report).
+    """
+    by_source = {}
+    duplicate_sources = {}
+    for doc in docs:
+        source = doc.metadata.get("source")
+        if source:
+            chunks = by_source.setdefault(source, [])
+            if doc.page_content:
+                chunks.append(doc.page_content)
+            # Near-duplicate chunks are stored once; name the other notes holding them.
+            for other in doc.metadata.get("duplicate_sources") or []:
+                if other != source and other not in duplicate_sources.setdefault(source, []):
+                    duplicate_sources[source].append(other)
+
+    notes = []
+    for source, chunks in by_source.items():
+        try:
+            text = read_file(source)
+        except Exception as e:
+            print(f"Error reading file {source}: {e}")
+            continue
+        if chunks:
+            spans = _excerpt_spans(text, chunks, neighbour_chunks * chunk_chars, section_tokens)
+            excerpt = _render_excerpts(text, spans) if spans else "\n\n".join(chunks)
+        else:
+            excerpt = _truncate(text, section_tokens)
+        notes.append({
+            "source": source,
+            "text": text,
+            "excerpt": excerpt,
+            "full": False,
+            "linked": not chunks,
+            "duplicates": duplicate_sources.get(source, []),
+            "content": None,
+        })
+
+    remaining = token_budget
+    for note in notes:
+        cost = estimate_tokens(note["excerpt"])
+        if cost <= remaining:
+            note["content"] = note["excerpt"]
+        elif remaining > 0:
+            note["content"] = _truncate(note["excerpt"], remaining)
+        else:
+            continue
+        remaining -= estimate_tokens(note["content"])
+
+    for note in notes:
+        if note["content"] is None:
+            continue
+        extra = estimate_tokens(note["text"]) - estimate_tokens(note["content"])
+        if extra <= remaining:
+            note["content"] = note["text"]
+            note["full"] = True
+            remaining -= max(0, extra)
+
+    report = {
+        "files_full": 0,
+        "files_excerpted": 0,
+        "files_skipped": 0,
+        "included_tokens": 0,
+        "truncated_tokens": 0,
+    }
+    context_parts = []
+    for note in notes:
+        total = estimate_tokens(note["text"])
+        if note["content"] is None:
+            report["files_skipped"] += 1
+            report["truncated_tokens"] += total
+            continue
+        included = estimate_tokens(note["content"])
+        report["files_full" if note["full"] else "files_excerpted"] += 1
+        report["included_tokens"] += included
+        report["truncated_tokens"] += max(0, total - included)
+        label = note["source"] if note["full"] else f"{note['source']} (excerpts)"
+        if note["linked"]:
+            label += " [linked]"
+        if note["duplicates"]:
+            label += f"\nALSO IN (near-duplicate text): {', '.join(note['duplicates'])}"
+        context_parts.append(
+            f"FILE SOURCE: {label}\n"
+            f"{_SEPARATOR}\n"
+            f"{note['content']}\n"
+            f"{_SEPARATOR}"
+        )
+
+    if not context_parts:
+        return "", report
+    summary = (
+        f"CONTEXT: files full={report['files_full']} excerpted={report['files_excerpted']} "
+        f"skipped={report['files_skipped']}; ~{report['included_tokens']} tokens included, "
+        f"~{report['truncated_tokens']} truncated (budget {token_budget})."
+    )
+    return "\n\n".join([summary] + context_parts), report
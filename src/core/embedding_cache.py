@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+from core.config import get_setting
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n")
+    return "\n".join(line.rstrip() for line in text.strip().split("\n"))
+
+
+class EmbeddingCache:
+    def __init__(self, path, max_entries=100_000):
+        self._path = path
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._ensure_schema()
+        with sqlite3.connect(self._path) as conn:
+            self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys):
+        found = {}
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" for _ in batch)
+                cursor = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, blob in cursor:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                conn.commit()
+        with self._lock:
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items]
+        with sqlite3.connect(self._path) as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            inserted = conn.total_changes - before
+            with self._lock:
+                self._count += inserted
+                excess = self._count - self._max_entries
+            if excess > 0:
+                conn.execute(
+                    """
+                    DELETE FROM embeddings
+                    WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+                    )
+                    """,
+                    (excess,),
+                )
+                with self._lock:
+                    self._count -= excess
+                    self.stats["evictions"] += excess
+            conn.commit()
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS embeddings (
+                        key TEXT PRIMARY KEY,
+                        vector BLOB NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+            conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, cache, namespace):
+        self._embeddings = embeddings
+        self._cache = cache
+        self._namespace = namespace
+
+    @property
+    def stats(self):
+        return self._cache.stats
+
+    def embed_documents(self, texts):
+        keys = [self._key("document", text) for text in texts]
+        cached = self._cache.get_many(list(dict.fromkeys(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self._embeddings.embed_documents(list(missing.values()))
+            fresh = list(zip(missing.keys(), vectors))
+            self._cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        cached = self._cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        vector = self._embeddings.embed_query(text)
+        self._cache.put_many([(key, vector)])
+        return vector
+
+    def _key(self, kind, text):
+        # Queries and documents are embedded with different task types, so
+        # the same text must not share a vector between the two.
+        payload = f"{self._namespace}\0{kind}\0{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def with_embedding_cache(embeddings, namespace):
+    max_entries = get_setting("embedding_cache_max_entries", default=100_000)
+    if not max_entries:
+        return embeddings
+    path = get_setting("embedding_cache_path")
+    if not path:
+        persist_dir = get_setting("chroma_persist_dir", required=True)
+        path = os.path.join(persist_dir, "embedding_cache.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return CachedEmbeddings(embeddings, EmbeddingCache(path, max_entries), namespace)
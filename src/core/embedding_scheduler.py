@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from core.config import get_setting
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self._rate = float(rate)
+        self._capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self._capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated) * self._rate,
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_for = (tokens - self._tokens) / self._rate
+            self._sleep(wait_for)
+
+
+class EmbeddingScheduler:
+    def __init__(
+            self,
+            embeddings,
+            batch_size=100,
+            max_in_flight=4,
+            requests_per_minute=None,
+            max_retries=5,
+            initial_backoff=1.0,
+            max_backoff=60.0,
+            sleep=time.sleep,
+    ):
+        self._embeddings = embeddings
+        self._batch_size = max(1, batch_size)
+        self._max_in_flight = max(1, max_in_flight)
+        self._max_retries = max_retries
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._sleep = sleep
+        self._bucket = None
+        if requests_per_minute:
+            self._bucket = TokenBucket(requests_per_minute / 60.0, sleep=sleep)
+        self.stats = {"batches": 0, "texts": 0, "retries": 0}
+        # Retries are counted from the worker threads.
+        self._lock = threading.Lock()
+
+    def run(self, items, commit):
+        """Embed (doc, id) pairs in batches, calling commit(docs, ids, vectors) per batch."""
+        items = iter(items)
+
+        def _next_batch():
+            batch = list(islice(items, self._batch_size))
+            if not batch:
+                return None
+            return [doc for doc, _ in batch], [doc_id for _, doc_id in batch]
+
+        committed = 0
+        with ThreadPoolExecutor(max_workers=self._max_in_flight) as executor:
+            # Only max_in_flight batches are pulled from items at a time, so a
+            # streamed producer is held back instead of buffering everything.
+            pending = {}
+            while len(pending) < self._max_in_flight:
+                batch = _next_batch()
+                if batch is None:
+                    break
+                pending[executor.submit(self._embed_with_retry, batch[0])] = batch
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_docs, batch_ids = pending.pop(future)
+                    vectors = future.result()
+                    commit(batch_docs, batch_ids, vectors)
+                    committed += len(batch_ids)
+                    self.stats["batches"] += 1
+                    self.stats["texts"] += len(batch_ids)
+                    batch = _next_batch()
+                    if batch is not None:
+                        pending[executor.submit(self._embed_with_retry, batch[0])] = batch
+        return committed
+
+    def _embed_with_retry(self, batch_docs):
+        texts = [doc.page_content for doc in batch_docs]
+        attempt = 0
+        while True:
+            if self._bucket:
+                self._bucket.acquire()
+            try:
+                return self._embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self._max_retries or not _is_transient(e):
+                    raise
+                delay = min(self._max_backoff, self._initial_backoff * (2 ** attempt))
+                self._sleep(delay * (0.5 + random.random() / 2))
+                attempt += 1
+                with self._lock:
+                    self.stats["retries"] += 1
+
+
+_TRANSIENT_MARKERS = (
+    "429",
+    "rate limit",
+    "ratelimit",
+    "rate_limit",
+    "quota",
+    "resource_exhausted",
+    "timeout",
+    "timed out",
+    "unavailable",
+    "deadline",
+)
+
+
+def _is_transient(error):
+    """Whether a failed embedding request is worth retrying: rate limits, 5xx, timeouts."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    response = getattr(error, "response", None)
+    statuses = (getattr(error, "status_code", None), getattr(error, "code", None), getattr(response, "status_code", None))
+    for status in statuses:
+        if isinstance(status, int):
+            return status == 429 or 500 <= status < 600
+    message = str(error).lower()
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+def create_embedding_scheduler(embeddings, batch_size=None, max_in_flight=None):
+    return EmbeddingScheduler(
+        embeddings,
+        batch_size=batch_size or get_setting("embedding_batch_size", default=100),
+        max_in_flight=max_in_flight or get_setting("embedding_max_in_flight", default=4),
+        requests_per_minute=get_setting("embedding_requests_per_minute"),
+        max_retries=get_setting("embedding_max_retries", default=5),
+    )
@@ -0,0 +1,69 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from core.config import get_setting
+
+
+class FileCache:
+    """Byte-bounded LRU of file contents, validated against mtime and size on every read."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, mmap_threshold=0):
+        self._max_bytes = max_bytes
+        self._mmap_threshold = mmap_threshold
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._bytes
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def read_text(self, path, encoding="utf-8"):
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        text = self._read(path, stat.st_size, encoding)
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if stat.st_size <= self._max_bytes:
+                self._entries[path] = (key, text, stat.st_size)
+                self._bytes += stat.st_size
+                while self._bytes > self._max_bytes:
+                    _, (_, _, size) = self._entries.popitem(last=False)
+                    self._bytes -= size
+                    self._stats["evictions"] += 1
+        return text
+
+    def _read(self, path, size, encoding):
+        with open(path, "rb") as f:
+            if self._mmap_threshold and size >= self._mmap_threshold:
+                # Decoded straight from the mapped pages, so no bytes copy of the
+                # file is held next to the text while it is decoded.
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    return str(view, encoding)
+            return f.read().decode(encoding)
+
+
+def create_file_cache():
+    return FileCache(
+        max_bytes=get_setting("file_cache_max_bytes", default=64 * 1024 * 1024),
+        mmap_threshold=get_setting("file_cache_mmap_threshold", default=0),
+    )
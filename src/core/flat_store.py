@@ -0,0 +1,414 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from core.lexical_index import where_sql
+
+_BLOCK_ROWS = 32768
+_MIN_CAPACITY = 1024
+_COMPACT_MIN_TOMBSTONES = 1024
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _placeholders(values):
+    return ",".join("?" for _ in values)
+
+
+class FlatCollection:
+    """Exact-search vector collection with the part of Chroma's collection API the indexer uses.
+
+    Normalized vectors live in a memory-mapped .npy matrix, so opening it is
+    instant and a search is one blocked matrix product; ids, documents and
+    metadata live in SQLite next to it. Deleted rows are NaN tombstones until
+    they make up half the matrix, when the live rows are compacted into a new
+    file. Every query reads the row count and file generation in one SQLite
+    read transaction, so searches in other processes see appends and
+    compactions without reopening the store.
+    """
+
+    def __init__(self, directory, dtype="float32"):
+        self._directory = directory
+        self._path = os.path.join(directory, "rows.sqlite3")
+        self._dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._matrices = {}
+        os.makedirs(directory, exist_ok=True)
+        self._ensure_schema()
+
+    def count(self):
+        with sqlite3.connect(self._path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=None):
+        include = ["metadatas", "documents"] if include is None else include
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"chunk_id IN ({_placeholders(ids)})")
+            params.extend(ids)
+        if where:
+            sql, where_params = where_sql(where, column="metadata")
+            clauses.append(sql)
+            params.extend(where_params)
+        sql = "SELECT row, chunk_id, document, metadata FROM rows"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY row LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset or 0])
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN")
+            rows = conn.execute(sql, params).fetchall()
+            matrix = self._snapshot(conn)[0] if "embeddings" in include else None
+            conn.commit()
+        result = {"ids": [chunk_id for _, chunk_id, _, _ in rows]}
+        if "documents" in include:
+            result["documents"] = [document for _, _, document, _ in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(metadata) for _, _, _, metadata in rows]
+        if "embeddings" in include:
+            positions = [row for row, _, _, _ in rows]
+            if matrix is None or not positions:
+                result["embeddings"] = np.empty((0, 0), dtype=np.float32)
+            else:
+                result["embeddings"] = np.asarray(matrix[positions], dtype=np.float32)
+        return result
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        if not len(ids):
+            return
+        latest = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        positions = list(latest.values())
+        vectors = _normalize(embeddings)[positions]
+        documents = [documents[i] if documents else "" for i in positions]
+        metadatas = [metadatas[i] if metadatas else {} for i in positions]
+        ids = list(latest)
+        with self._lock, sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            meta = self._meta(conn)
+            existing = dict(
+                conn.execute(f"SELECT chunk_id, row FROM rows WHERE chunk_id IN ({_placeholders(ids)})", ids)
+            )
+            size = meta["size"]
+            matrix = self._writable(conn, meta, size + sum(chunk_id not in existing for chunk_id in ids), vectors.shape[1])
+            rows = []
+            for chunk_id in ids:
+                if chunk_id in existing:
+                    rows.append(existing[chunk_id])
+                else:
+                    rows.append(size)
+                    size += 1
+            # Vectors land before the rows that point at them are committed,
+            # so a crash leaves at most unreferenced rows past the stored size.
+            matrix[rows] = vectors
+            matrix.flush()
+            conn.executemany(
+                "INSERT OR REPLACE INTO rows (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (row, chunk_id, document, json.dumps(metadata))
+                    for row, chunk_id, document, metadata in zip(rows, ids, documents, metadatas)
+                ],
+            )
+            self._set_meta(conn, size=size)
+            conn.commit()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        with self._lock, sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if metadatas is not None:
+                conn.executemany(
+                    "UPDATE rows SET metadata = ? WHERE chunk_id = ?",
+                    [(json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas)],
+                )
+            if documents is not None:
+                conn.executemany(
+                    "UPDATE rows SET document = ? WHERE chunk_id = ?",
+                    list(zip(documents, ids)),
+                )
+            if embeddings is not None:
+                found = dict(conn.execute(f"SELECT chunk_id, row FROM rows WHERE chunk_id IN ({_placeholders(ids)})", ids))
+                meta = self._meta(conn)
+                pairs = [(found[chunk_id], i) for i, chunk_id in enumerate(ids) if chunk_id in found]
+                if pairs:
+                    matrix = self._writable(conn, meta, meta["size"], len(embeddings[0]))
+                    matrix[[row for row, _ in pairs]] = _normalize(embeddings)[[i for _, i in pairs]]
+                    matrix.flush()
+            conn.commit()
+
+    def delete(self, ids=None, where=None):
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"chunk_id IN ({_placeholders(ids)})")
+            params.extend(ids)
+        if where:
+            sql, where_params = where_sql(where, column="metadata")
+            clauses.append(sql)
+            params.extend(where_params)
+        if not clauses:
+            return
+        with self._lock, sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            condition = " AND ".join(clauses)
+            rows = [row for row, in conn.execute(f"SELECT row FROM rows WHERE {condition}", params)]
+            if not rows:
+                conn.commit()
+                return
+            conn.execute(f"DELETE FROM rows WHERE {condition}", params)
+            meta = self._meta(conn)
+            matrix = self._open(meta["generation"])
+            tombstones = meta["tombstones"] + len(rows)
+            self._set_meta(conn, tombstones=tombstones)
+            conn.commit()
+            # Tombstones are written after the commit: a crash in between
+            # leaves a vector without a row, which searches skip.
+            matrix[rows] = np.nan
+            matrix.flush()
+            if tombstones >= max(_COMPACT_MIN_TOMBSTONES, meta["size"] // 2):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the live rows into a new, dense matrix file."""
+        with self._lock, sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            meta = self._meta(conn)
+            old = self._snapshot(conn)[0]
+            if old is None:
+                conn.commit()
+                return
+            live = np.fromiter((row for row, in conn.execute("SELECT row FROM rows ORDER BY row")), dtype=np.int64)
+            generation = meta["generation"] + 1
+            new = self._create(generation, max(len(live), _MIN_CAPACITY), old.shape[1])
+            for start in range(0, len(live), _BLOCK_ROWS):
+                new[start : start + _BLOCK_ROWS] = old[live[start : start + _BLOCK_ROWS]]
+            new.flush()
+            # New positions never exceed old ones, so renumbering in row order
+            # cannot collide with a row that still has to move.
+            conn.executemany(
+                "UPDATE rows SET row = ? WHERE row = ?",
+                [(position, int(row)) for position, row in enumerate(live) if position != row],
+            )
+            self._set_meta(conn, size=len(live), tombstones=0, generation=generation)
+            conn.commit()
+        self._remove_generations(below=generation)
+
+    def query(self, vectors, k=4, where=None):
+        """Exact top-k by cosine distance for a batch of query vectors.
+
+        Returns one list of (chunk_id, document, metadata, distance) per query,
+        closest first.
+        """
+        queries = _normalize(vectors)
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("BEGIN")
+            matrix, size = self._snapshot(conn)
+            candidates = None
+            if where:
+                sql, params = where_sql(where, column="metadata")
+                candidates = np.fromiter(
+                    (row for row, in conn.execute(f"SELECT row FROM rows WHERE {sql} ORDER BY row", params)),
+                    dtype=np.int64,
+                )
+            if matrix is None or not size or (candidates is not None and not len(candidates)):
+                conn.commit()
+                return [[] for _ in queries]
+            best_rows, best_scores = self._top_k(matrix, size, queries, k, candidates)
+            wanted = sorted({int(row) for row in best_rows[np.isfinite(best_scores)]})
+            found = {}
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start : start + 500]
+                found.update(
+                    (row, (chunk_id, document, json.loads(metadata)))
+                    for row, chunk_id, document, metadata in conn.execute(
+                        f"SELECT row, chunk_id, document, metadata FROM rows WHERE row IN ({_placeholders(batch)})",
+                        batch,
+                    )
+                )
+            conn.commit()
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            results.append([
+                (*found[int(row)], float(1.0 - score))
+                for row, score in zip(rows, scores)
+                if np.isfinite(score) and int(row) in found
+            ])
+        return results
+
+    def _top_k(self, matrix, size, queries, k, candidates=None):
+        total = size if candidates is None else len(candidates)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, total, _BLOCK_ROWS):
+            end = min(start + _BLOCK_ROWS, total)
+            if candidates is None:
+                rows = np.arange(start, end)
+                block = matrix[start:end]
+            else:
+                rows = candidates[start:end]
+                block = matrix[rows]
+            scores = queries @ np.asarray(block, dtype=np.float32).T
+            # Tombstoned rows are NaN and never rank.
+            scores[np.isnan(scores)] = -np.inf
+            rows = np.broadcast_to(rows, scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _snapshot(self, conn):
+        meta = self._meta(conn)
+        return self._open(meta["generation"]), meta["size"]
+
+    def _open(self, generation):
+        with self._lock:
+            matrix = self._matrices.get(generation)
+            if matrix is None:
+                path = self._vectors_path(generation)
+                if not os.path.exists(path):
+                    return None
+                matrix = self._matrices[generation] = np.load(path, mmap_mode="r+")
+                # Keep the previous generation for searches still reading it.
+                for old in [g for g in self._matrices if g < generation - 1]:
+                    del self._matrices[old]
+            return matrix
+
+    def _writable(self, conn, meta, rows_needed, dimensions):
+        matrix = self._open(meta["generation"])
+        if matrix is not None and matrix.shape[1] != dimensions:
+            raise ValueError(
+                f"Embedding dimension {dimensions} does not match the flat index "
+                f"({matrix.shape[1]}); rebuild the index."
+            )
+        if matrix is not None and rows_needed <= matrix.shape[0]:
+            return matrix
+        generation = meta["generation"] + 1
+        capacity = max(rows_needed, _MIN_CAPACITY, 2 * (matrix.shape[0] if matrix is not None else 0))
+        grown = self._create(generation, capacity, dimensions)
+        if matrix is not None:
+            for start in range(0, meta["size"], _BLOCK_ROWS):
+                grown[start : min(start + _BLOCK_ROWS, meta["size"])] = matrix[start : min(start + _BLOCK_ROWS, meta["size"])]
+        grown.flush()
+        self._set_meta(conn, generation=generation)
+        meta["generation"] = generation
+        self._remove_generations(below=generation)
+        return grown
+
+    def _create(self, generation, capacity, dimensions):
+        path = self._vectors_path(generation)
+        matrix = np.lib.format.open_memmap(path, mode="w+", dtype=self._dtype, shape=(capacity, dimensions))
+        with self._lock:
+            self._matrices[generation] = matrix
+        return matrix
+
+    def _remove_generations(self, below):
+        for name in os.listdir(self._directory):
+            if name.startswith("vectors-") and name.endswith(".npy"):
+                generation = int(name[len("vectors-") : -len(".npy")])
+                if generation < below - 1:
+                    try:
+                        os.remove(os.path.join(self._directory, name))
+                    except OSError:
+                        # Still mapped elsewhere (Windows); removed on a later compaction.
+                        pass
+
+    def _vectors_path(self, generation):
+        return os.path.join(self._directory, f"vectors-{generation}.npy")
+
+    def _meta(self, conn):
+        meta = {"size": 0, "tombstones": 0, "generation": 0}
+        meta.update((key, int(value)) for key, value in conn.execute("SELECT key, value FROM meta"))
+        return meta
+
+    def _set_meta(self, conn, **values):
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            list(values.items()),
+        )
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            # WAL lets searches read a consistent snapshot while build_index writes.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS rows (
+                        row INTEGER PRIMARY KEY,
+                        chunk_id TEXT NOT NULL UNIQUE,
+                        document TEXT,
+                        metadata TEXT NOT NULL
+                    )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value INTEGER NOT NULL
+                    )
+                """
+            )
+            conn.commit()
+
+
+class FlatVectorStore:
+    """Vector store over a FlatCollection with the search methods retrieval uses."""
+
+    def __init__(self, directory, embeddings, dtype="float32"):
+        self._collection = FlatCollection(directory, dtype=dtype)
+        self.embeddings = embeddings
+
+    def add_documents(self, documents, ids=None):
+        ids = ids or [doc.id for doc in documents]
+        self._collection.upsert(
+            ids=ids,
+            embeddings=self.embeddings.embed_documents([doc.page_content for doc in documents]),
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+        )
+        return ids
+
+    def similarity_search_by_vectors(self, embeddings, k=4, filter=None):
+        """Batched search: one list of (Document, distance) pairs per query vector."""
+        return [
+            [
+                (Document(page_content=document or "", metadata=metadata, id=chunk_id), distance)
+                for chunk_id, document, metadata, distance in hits
+            ]
+            for hits in self._collection.query(embeddings, k=k, where=filter)
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None):
+        return self.similarity_search_by_vectors([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self.embeddings.embed_query(query),
+            k=k,
+            filter=filter,
+        )
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        relevance = self._select_relevance_score_fn()
+        return [(doc, relevance(distance)) for doc, distance in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda distance: 1.0 - distance
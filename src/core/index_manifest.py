@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+
+from core.config import get_setting
+
+
+class IndexManifest:
+    def __init__(self, path):
+        self._path = path
+        self._ensure_schema()
+
+    def load_stats(self):
+        with sqlite3.connect(self._path) as conn:
+            cursor = conn.execute(
+                "SELECT path, mtime, size, content_hash, epoch FROM indexed_files"
+            )
+            return {
+                path: {
+                    "mtime": mtime,
+                    "size": size,
+                    "content_hash": content_hash,
+                    "epoch": epoch,
+                }
+                for path, mtime, size, content_hash, epoch in cursor
+            }
+
+    def get_chunk_ids(self, path):
+        with sqlite3.connect(self._path) as conn:
+            row = conn.execute(
+                "SELECT chunk_ids FROM indexed_files WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if not row:
+            return []
+        return json.loads(row[0])
+
+    def sources_under(self, directory):
+        """Paths of indexed notes anywhere below directory."""
+        prefix = os.path.join(directory, "")
+        with sqlite3.connect(self._path) as conn:
+            cursor = conn.execute(
+                "SELECT path FROM indexed_files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+            return [row[0] for row in cursor]
+
+    def upsert(self, entries):
+        rows = [
+            (
+                path,
+                entry["mtime"],
+                entry["size"],
+                entry["content_hash"],
+                json.dumps(entry["chunk_ids"]),
+                entry.get("epoch", 0),
+            )
+            for path, entry in entries.items()
+        ]
+        if not rows:
+            return
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany(
+                """
+                INSERT INTO indexed_files (path, mtime, size, content_hash, chunk_ids, epoch)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    mtime = excluded.mtime,
+                    size = excluded.size,
+                    content_hash = excluded.content_hash,
+                    chunk_ids = excluded.chunk_ids,
+                    epoch = excluded.epoch
+                """,
+                rows,
+            )
+            conn.commit()
+
+    def touch(self, path, mtime, size):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute(
+                "UPDATE indexed_files SET mtime = ?, size = ? WHERE path = ?",
+                (mtime, size, path),
+            )
+            conn.commit()
+
+    def delete(self, paths):
+        if not paths:
+            return
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany(
+                "DELETE FROM indexed_files WHERE path = ?",
+                [(path,) for path in paths],
+            )
+            conn.commit()
+
+    def get_chunk_ids_many(self, paths):
+        found = {}
+        paths = list(paths)
+        with sqlite3.connect(self._path) as conn:
+            for i in range(0, len(paths), 500):
+                batch = paths[i : i + 500]
+                placeholders = ",".join("?" for _ in batch)
+                cursor = conn.execute(
+                    f"SELECT path, chunk_ids FROM indexed_files WHERE path IN ({placeholders})",
+                    batch,
+                )
+                for path, chunk_ids in cursor:
+                    found[path] = json.loads(chunk_ids)
+        return found
+
+    def add_pending_deletes(self, chunk_ids):
+        if not chunk_ids:
+            return
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO pending_deletes (chunk_id) VALUES (?)",
+                [(chunk_id,) for chunk_id in chunk_ids],
+            )
+            conn.commit()
+
+    def pending_deletes(self, limit=200):
+        with sqlite3.connect(self._path) as conn:
+            cursor = conn.execute(
+                "SELECT chunk_id FROM pending_deletes LIMIT ?",
+                (limit,),
+            )
+            return [row[0] for row in cursor]
+
+    def remove_pending_deletes(self, chunk_ids):
+        if not chunk_ids:
+            return
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany(
+                "DELETE FROM pending_deletes WHERE chunk_id = ?",
+                [(chunk_id,) for chunk_id in chunk_ids],
+            )
+            conn.commit()
+
+    def get_meta(self, key, default=None):
+        with sqlite3.connect(self._path) as conn:
+            row = conn.execute(
+                "SELECT value FROM manifest_meta WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with sqlite3.connect(self._path) as conn:
+            if value is None:
+                conn.execute("DELETE FROM manifest_meta WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    """
+                    INSERT INTO manifest_meta (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                    """,
+                    (key, str(value)),
+                )
+            conn.commit()
+
+    def clear(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("DELETE FROM indexed_files")
+            conn.execute("DELETE FROM manifest_meta")
+            conn.execute("DELETE FROM pending_deletes")
+            conn.commit()
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS indexed_files (
+                        path TEXT PRIMARY KEY,
+                        mtime REAL NOT NULL,
+                        size INTEGER NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        chunk_ids TEXT NOT NULL,
+                        epoch INTEGER NOT NULL DEFAULT 0
+                    )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(indexed_files)")}
+            if "epoch" not in columns:
+                conn.execute(
+                    "ALTER TABLE indexed_files ADD COLUMN epoch INTEGER NOT NULL DEFAULT 0"
+                )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS manifest_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS pending_deletes (
+                        chunk_id TEXT PRIMARY KEY
+                    )
+                """
+            )
+            conn.commit()
+
+
+def create_index_manifest(directory=None):
+    path = None if directory else get_setting("index_manifest_path")
+    if not path:
+        persist_dir = directory or get_setting("chroma_persist_dir", required=True)
+        path = os.path.join(persist_dir, "index_manifest.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return IndexManifest(path)
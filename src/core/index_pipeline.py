@@ -0,0 +1,1028 @@
+import hashlib
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownHeaderTextSplitter
+
+from core.chunk_dedup import create_dedup_index
+from core.chunk_reader import add_offsets, hydrate_chunks, text_hash
+from core.config import get_setting
+from core.content_chunker import split_note_content_defined
+from core.embedding_scheduler import create_embedding_scheduler
+from core.index_manifest import create_index_manifest
+from core.lexical_index import create_lexical_index
+from core.link_graph import create_link_graph, extract_links
+from core.note_metadata import note_metadata
+from core.note_summary import note_id, summarize_note
+from core.rag_store import get_note_store, get_sharded_vector_store, note_index_enabled
+from core.shards import (
+    ROOT_SHARD,
+    ShardedDedupIndex,
+    ShardedVectorStore,
+    shard_directory,
+    shard_names,
+    shard_of,
+    sharding_mode,
+    shards_root,
+)
+
+_MARKDOWN_SPLITTER = MarkdownHeaderTextSplitter(
+    headers_to_split_on=[("##", "Header 2"), ("###", "Header 3")]
+)
+_TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200,
+    add_start_index=True,
+)
+_DONE = object()
+# Bump when note_metadata() changes, so the next sync refreshes every chunk's metadata.
+METADATA_VERSION = 2
+
+
+def doc_id(doc) -> str:
+    source = doc.metadata.get("source", "")
+    start = doc.metadata.get("start_index", "")
+    payload = f"{source}:{start}:{doc.page_content}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def discover_files(vault_path, recursive=True):
+    # Mirrors DirectoryLoader(glob="**/*.md") so sources keep the same form
+    # as chunks indexed before the manifest existed.
+    for dirpath, dirnames, filenames in os.walk(vault_path):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith(".")) if recursive else []
+        for name in sorted(filenames):
+            if name.startswith(".") or not name.endswith(".md"):
+                continue
+            source = str(Path(dirpath, name))
+            try:
+                stat = os.stat(source)
+            except OSError:
+                continue
+            yield source, stat
+
+
+def discover_shard_files(vault_path, shard):
+    """Notes of one shard; folder shards only walk their own folder."""
+    if sharding_mode() != "folder":
+        return ((source, stat) for source, stat in discover_files(vault_path) if shard_of(source, vault_path) == shard)
+    if shard == ROOT_SHARD:
+        return discover_files(vault_path, recursive=False)
+    return discover_files(os.path.join(vault_path, shard))
+
+
+def split_note(source, text, chunking_mode="recursive", metadata=None):
+    if chunking_mode == "content":
+        docs = split_note_content_defined(source, text)
+    else:
+        docs = _MARKDOWN_SPLITTER.split_text(text)
+        for split in docs:
+            split.metadata.update({"source": source})
+        docs = _TEXT_SPLITTER.split_documents(docs)
+    if metadata:
+        for doc in docs:
+            doc.metadata.update(metadata)
+    return docs
+
+
+def load_and_split(task):
+    source, known_hash, chunking_mode, with_summary, vault_path = task
+    try:
+        with open(source, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        return source, None, None, None, None, str(e)
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if content_hash == known_hash:
+        return source, content_hash, None, None, None, None
+    text = raw.decode("utf-8")
+    metadata = note_metadata(source, text, vault_path)
+    splits = add_offsets(text, split_note(source, text, chunking_mode, metadata))
+    summary = summarize_note(source, text, metadata) if with_summary else None
+    splits = [(doc_id(doc), doc) for doc in splits]
+    return source, content_hash, splits, summary, extract_links(text), None
+
+
+def _ordered_map(fn, items, workers, window):
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results are yielded in submission order, so chunk ids and their
+        # order match the serial path; the window bounds work held in memory.
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def _prefetch(iterable, maxsize):
+    """Run a generator stage on its own thread behind a bounded queue."""
+    items = queue.Queue(maxsize=maxsize)
+
+    def _run():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as e:
+            items.put(_StageError(e))
+            return
+        items.put(_DONE)
+
+    threading.Thread(target=_run, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def iter_sources(vector_store, page_size=1000):
+    """Yield the source of every chunk, one page of metadata at a time."""
+    offset = 0
+    while True:
+        result = vector_store._collection.get(
+            include=["metadatas"],
+            limit=page_size,
+            offset=offset,
+        )
+        ids = result.get("ids", [])
+        if not ids:
+            return
+        for metadata in result.get("metadatas", []):
+            yield (metadata or {}).get("source")
+        offset += len(ids)
+
+
+def ids_for_source(vector_store, source):
+    result = vector_store._collection.get(where={"source": source}, include=[])
+    return set(result.get("ids", []))
+
+
+def present_ids(vector_store, ids):
+    present = set()
+    for batch in chunked(ids, 200):
+        result = vector_store._collection.get(ids=batch, include=[])
+        present.update(result.get("ids", []))
+    return present
+
+
+def upsert_batch(vector_store, docs, ids, vectors, store_text=True):
+    # Without store_text, chunks that are verbatim slices of their note keep
+    # only offsets and a hash; the text is read back from the vault on demand.
+    vector_store._collection.upsert(
+        ids=ids,
+        embeddings=vectors,
+        documents=[
+            doc.page_content if store_text or "byte_start" not in doc.metadata else ""
+            for doc in docs
+        ],
+        metadatas=[doc.metadata for doc in docs],
+    )
+
+
+class _PendingManifest:
+    """Holds manifest entries until every chunk of their file is upserted."""
+
+    def __init__(self, manifest, flush_every=200):
+        self._manifest = manifest
+        self._flush_every = flush_every
+        self._entries = {}
+        self._remaining = {}
+        self._ready = {}
+        self._lock = threading.Lock()
+
+    def add(self, source, entry, remaining):
+        with self._lock:
+            if remaining:
+                self._entries[source] = entry
+                self._remaining[source] = remaining
+            else:
+                self._ready[source] = entry
+        self._maybe_flush()
+
+    def complete(self, sources):
+        with self._lock:
+            for source in sources:
+                self._remaining[source] -= 1
+                if not self._remaining[source]:
+                    del self._remaining[source]
+                    self._ready[source] = self._entries.pop(source)
+        self._maybe_flush()
+
+    def flush(self):
+        with self._lock:
+            ready, self._ready = self._ready, {}
+        self._manifest.upsert(ready)
+
+    def _maybe_flush(self):
+        if len(self._ready) >= self._flush_every:
+            self.flush()
+
+
+class VaultIndexer:
+    def __init__(
+            self,
+            vector_store,
+            manifest,
+            scheduler,
+            chunking_mode="recursive",
+            workers=1,
+            queue_size=256,
+            lexical_index=None,
+            note_store=None,
+            vault_path=None,
+            link_graph=None,
+            dedup_index=None,
+            chunk_storage="text",
+            shard=None,
+    ):
+        self._vector_store = vector_store
+        self._shard = shard
+        self._vault_path = vault_path
+        self._link_graph = link_graph
+        self._dedup = dedup_index
+        self._store_text = chunk_storage != "offsets"
+        self._rewrite_documents = False
+        self._lexical_index = lexical_index
+        self._note_store = note_store
+        self._manifest = manifest
+        self._scheduler = scheduler
+        self._chunking_mode = chunking_mode
+        self._workers = max(1, workers)
+        self._queue_size = max(1, queue_size)
+        self.stats = {
+            "files_scanned": 0,
+            "files_changed": 0,
+            "files_deleted": 0,
+            "files_renamed": 0,
+            "chunks_added": 0,
+            "chunks_reused": 0,
+            "chunks_deduplicated": 0,
+            "chunks_deleted": 0,
+        }
+
+    @property
+    def manifest(self):
+        return self._manifest
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def dedup_index(self):
+        return self._dedup
+
+    def reindex_pending(self):
+        return bool(self._manifest.get_meta("reindex_epoch"))
+
+    def _discover(self, vault_path):
+        if self._shard is None:
+            return discover_files(vault_path)
+        return discover_shard_files(vault_path, self._shard)
+
+    def sync_vault(self, vault_path, reindex=False, recreate_collection=False):
+        """discover -> read -> split -> hash -> diff -> embed -> upsert, streamed.
+
+        With reindex=True every note is re-embedded in place. Progress is
+        checkpointed in the manifest, so an interrupted run (reindex or not)
+        resumes on the next call without redoing finished files.
+        recreate_collection=True first recreates the Chroma collections with
+        the configured HNSW settings, then re-embeds into them as a reindex.
+        """
+        self._vault_path = vault_path
+        self._drain_pending_deletes()
+        if recreate_collection:
+            self._recreate_collections()
+        collection_count = self._vector_store._collection.count()
+        if collection_count == 0 and not self._manifest.get_meta("reindex_epoch"):
+            self._manifest.clear()
+            if self._lexical_index is not None:
+                self._lexical_index.clear()
+            # The link graph spans every shard, so one empty shard must not clear it.
+            if self._link_graph is not None and self._shard is None:
+                self._link_graph.clear()
+            if self._dedup is not None:
+                self._dedup.clear()
+        if self._shard is not None:
+            self._manifest.set_meta("shard", self._shard)
+        known = self._manifest.load_stats()
+        if self._lexical_index is not None:
+            if collection_count > 0 and (
+                    self._lexical_index.count() == 0 or self._manifest.get_meta("lexical_stale")
+            ):
+                self._lexical_index.clear()
+                self._backfill_lexical_index()
+            self._manifest.set_meta("lexical_stale", None)
+        if self._note_store is not None and collection_count > 0 and self._note_store._collection.count() == 0:
+            self._backfill_note_index(vault_path)
+        if self._link_graph is not None:
+            if collection_count > 0 and (
+                    self._link_graph.count() == 0 or self._manifest.get_meta("link_graph_stale")
+            ):
+                self._link_graph.clear()
+                self._backfill_link_graph(vault_path)
+            self._manifest.set_meta("link_graph_stale", None)
+
+        epoch = int(self._manifest.get_meta("epoch", 0))
+        reindex_epoch = self._manifest.get_meta("reindex_epoch")
+        if reindex and reindex_epoch is None:
+            reindex_epoch = epoch + 1
+            self._manifest.set_meta("reindex_epoch", reindex_epoch)
+        if reindex_epoch is not None:
+            reindex_epoch = int(reindex_epoch)
+            self.stats["reindex_epoch"] = reindex_epoch
+
+        # A collection built before the manifest existed has no per-file record,
+        # so chunk ids are looked up per source in Chroma until the manifest
+        # has been filled in by this run.
+        bootstrap = not known and collection_count > 0
+
+        def _previous_ids(source):
+            if bootstrap:
+                return ids_for_source(self._vector_store, source)
+            if source not in known:
+                return set()
+            return set(self._manifest.get_chunk_ids(source))
+
+        # Switching chunking modes changes every chunk id, so every note is
+        # re-split once while the manifest still supplies the ids to retire.
+        # A new metadata version re-splits too, but only rewrites metadata.
+        previous_mode = self._manifest.get_meta("chunking_mode", "recursive")
+        previous_metadata = int(self._manifest.get_meta("metadata_version", 0))
+        storage = "text" if self._store_text else "offsets"
+        self._rewrite_documents = bool(known) and self._manifest.get_meta("chunk_storage", "text") != storage
+        resplit_all = bool(known) and (
+            previous_mode != self._chunking_mode
+            or previous_metadata != METADATA_VERSION
+            or self._rewrite_documents
+        )
+
+        seen_sources = set()
+
+        def _changed_files():
+            for source, stat in self._discover(vault_path):
+                seen_sources.add(source)
+                self.stats["files_scanned"] += 1
+                entry = known.get(source)
+                # Notes an interrupted reindex already finished carry its epoch
+                # and are skipped like any unchanged note.
+                force = reindex_epoch is not None and (not entry or entry["epoch"] < reindex_epoch)
+                if not (force or resplit_all):
+                    if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                        continue
+                yield source, stat, entry, force or resplit_all, force
+
+        before = dict(self.stats)
+        try:
+            self._index_files(
+                _changed_files(),
+                _previous_ids,
+                check_present=collection_count > 0,
+                epoch=reindex_epoch if reindex_epoch is not None else epoch,
+                checkpoint_every=1 if reindex_epoch is not None else 200,
+            )
+
+            if bootstrap:
+                previous_sources = set(iter_sources(self._vector_store)) - {None}
+            else:
+                previous_sources = known.keys()
+            deleted_sources = [source for source in previous_sources if source not in seen_sources]
+            self._remove_sources(deleted_sources, _previous_ids)
+        finally:
+            self._mark_stale_indexes(before)
+        self._manifest.set_meta("chunking_mode", self._chunking_mode)
+        self._manifest.set_meta("metadata_version", METADATA_VERSION)
+        self._manifest.set_meta("chunk_storage", storage)
+        self._rewrite_documents = False
+
+        if reindex_epoch is not None:
+            self._sweep_orphans()
+            self._manifest.set_meta("epoch", reindex_epoch)
+            self._manifest.set_meta("reindex_epoch", None)
+        return self.stats
+
+    def _recreate_collections(self):
+        # Chunk ids do not depend on the collection, so the manifest, BM25 index
+        # and link graph stay valid; every note is re-embedded as a fresh reindex.
+        pending = self._manifest.get_meta("reindex_epoch")
+        if pending is not None and self._manifest.get_meta("recreated_epoch") == pending:
+            # Already recreated by the interrupted run this one resumes.
+            return
+        reindex_epoch = max(int(self._manifest.get_meta("epoch", 0)), int(pending or 0)) + 1
+        self._vector_store.reset_collection()
+        if self._dedup is not None:
+            # Clusters point at vectors the old collection held.
+            self._dedup.clear()
+        self._manifest.set_meta("reindex_epoch", reindex_epoch)
+        self._manifest.set_meta("recreated_epoch", reindex_epoch)
+        if self._note_store is not None:
+            self._recreate_note_store()
+
+    def _recreate_note_store(self):
+        # Summaries came from the chat model, so they are re-embedded, not rewritten.
+        result = self._note_store._collection.get(include=["documents", "metadatas"])
+        summaries = [
+            (Document(page_content=text or "", metadata=metadata or {}), summary_id)
+            for summary_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+        self._note_store.reset_collection()
+        self._index_summaries(summaries)
+
+    def sources_under(self, directory):
+        """Indexed notes below directory, e.g. to expand a folder rename or delete."""
+        return self._manifest.sources_under(directory)
+
+    def sync_paths(self, changed=(), deleted=(), moved=None):
+        """Index an explicit set of changed, deleted and renamed notes."""
+        self._drain_pending_deletes()
+        known = self._manifest.load_stats()
+        epoch = int(self._manifest.get_meta("epoch", 0))
+
+        def _previous_ids(source):
+            if source in known:
+                return set(self._manifest.get_chunk_ids(source))
+            return ids_for_source(self._vector_store, source)
+
+        changed = set(changed)
+        deleted = set(deleted)
+        before = dict(self.stats)
+        try:
+            for old, new in (moved or {}).items():
+                if not os.path.exists(new):
+                    deleted.add(old)
+                    continue
+                self._rename(old, new, _previous_ids, epoch)
+                changed.discard(new)
+
+            removed = [source for source in deleted if not os.path.exists(source)]
+            self._remove_sources(removed, _previous_ids)
+            changed.update(deleted - set(removed))
+
+            def _changed_files():
+                for source in sorted(changed - set(removed)):
+                    try:
+                        stat = os.stat(source)
+                    except OSError:
+                        continue
+                    entry = known.get(source)
+                    if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                        continue
+                    yield source, stat, entry, False, False
+
+            self._index_files(_changed_files(), _previous_ids, check_present=True, epoch=epoch)
+        finally:
+            self._mark_stale_indexes(before)
+        return self.stats
+
+    def _mark_stale_indexes(self, before):
+        # Notes changed with no BM25 index or link graph attached are missing
+        # from any copy left on disk, so it is rebuilt if enabled again.
+        if self._lexical_index is not None and self._link_graph is not None:
+            return
+        changed = [key for key in self.stats if key not in {"files_scanned", "reindex_epoch"}]
+        if not any(self.stats[key] != before.get(key) for key in changed):
+            return
+        if self._lexical_index is None:
+            self._manifest.set_meta("lexical_stale", 1)
+        if self._link_graph is None:
+            self._manifest.set_meta("link_graph_stale", 1)
+
+    def _rename(self, old, new, previous_ids, epoch):
+        # Vectors are copied from the old chunks by text hash, so a rename (or
+        # a rename plus a small edit) only embeds chunks whose text is new.
+        old_ids = previous_ids(old)
+        reuse_vectors = {}
+        for batch in chunked(list(old_ids), 200):
+            result = self._vector_store._collection.get(
+                ids=batch,
+                include=["documents", "metadatas", "embeddings"],
+            )
+            vectors = result.get("embeddings")
+            if vectors is None:
+                vectors = []
+            for text, metadata, vector in zip(result.get("documents") or [], result.get("metadatas") or [], vectors):
+                key = (metadata or {}).get("chunk_hash") or (text_hash(text) if text else None)
+                if key:
+                    reuse_vectors[key] = vector
+        stat = os.stat(new)
+        self._index_files(
+            [(new, stat, None, False, False)],
+            previous_ids,
+            check_present=True,
+            epoch=epoch,
+            reuse_vectors=reuse_vectors,
+        )
+        self._remove_sources([old], previous_ids)
+        self.stats["files_deleted"] -= 1
+        self.stats["files_renamed"] += 1
+
+    def _index_files(self, files, previous_ids, check_present, epoch=0, reuse_vectors=None, checkpoint_every=200):
+        in_flight = {}
+        # A forced re-embed cannot tell its own committed chunks from the old
+        # ones, so a reindex checkpoints every finished note straight away;
+        # otherwise a killed run would redo up to checkpoint_every notes.
+        pending = _PendingManifest(self._manifest, flush_every=checkpoint_every)
+        stale_buffer = []
+        summaries = []
+        links = {}
+        touched_clusters = set()
+
+        def _tasks():
+            for source, stat, entry, resplit, force in files:
+                in_flight[source] = (stat, force)
+                known_hash = entry["content_hash"] if entry and not resplit else None
+                yield (
+                    source,
+                    known_hash,
+                    self._chunking_mode,
+                    self._note_store is not None,
+                    self._vault_path,
+                )
+
+        def _diff():
+            results = _ordered_map(
+                load_and_split,
+                _prefetch(_tasks(), self._queue_size),
+                self._workers,
+                self._workers * 4,
+            )
+            for source, content_hash, splits, summary, note_links, error in results:
+                stat, force = in_flight.pop(source)
+                if error is not None:
+                    print(f"Error reading file {source}: {error}")
+                    continue
+                if splits is None:
+                    self._manifest.touch(source, stat.st_mtime, stat.st_size)
+                    continue
+                self.stats["files_changed"] += 1
+                if summary is not None:
+                    summaries.append((summary, note_id(source)))
+                    if len(summaries) >= 64:
+                        self._index_summaries(summaries)
+                        summaries.clear()
+                if self._link_graph is not None:
+                    links[source] = note_links
+                    if len(links) >= 256:
+                        self._link_graph.set_links(links)
+                        links.clear()
+
+                chunks = dict(splits)
+                old_ids = previous_ids(source)
+                stale_ids = old_ids - chunks.keys()
+                if not force:
+                    # Unchanged text keeps its id, but frontmatter or tags
+                    # elsewhere in the note may have changed its metadata.
+                    self._update_metadata(chunks, old_ids & chunks.keys())
+                if stale_ids:
+                    # Recorded before the manifest entry moves on, so a crash
+                    # can never orphan chunks the new entry no longer lists.
+                    self._manifest.add_pending_deletes(stale_ids)
+                    stale_buffer.extend(stale_ids)
+                if len(stale_buffer) >= 200:
+                    self._delete_ids(stale_buffer)
+                    stale_buffer.clear()
+
+                if force:
+                    to_embed = [(doc, chunk_id) for chunk_id, doc in chunks.items()]
+                else:
+                    to_embed = [(doc, chunk_id) for chunk_id, doc in chunks.items() if chunk_id not in old_ids]
+                    if to_embed and check_present:
+                        # Chunks committed by an interrupted run are already in Chroma.
+                        present = present_ids(self._vector_store, [chunk_id for _, chunk_id in to_embed])
+                        to_embed = [(doc, chunk_id) for doc, chunk_id in to_embed if chunk_id not in present]
+                if self._dedup is not None and to_embed:
+                    if stale_buffer:
+                        # The note's previous chunks go first, or an edited chunk
+                        # would join the cluster of its own earlier version.
+                        self._delete_ids(stale_buffer)
+                        stale_buffer.clear()
+                    # Near-duplicates join an existing cluster instead of being embedded.
+                    to_embed, duplicates = self._dedup.classify(to_embed)
+                    touched_clusters.update(cluster_id for _, _, cluster_id in duplicates)
+                    self.stats["chunks_deduplicated"] += len(duplicates)
+                    if duplicates and self._lexical_index is not None:
+                        # Members have no vector, but their exact terms stay searchable.
+                        self._lexical_index.upsert(
+                            [chunk_id for _, chunk_id, _ in duplicates],
+                            [doc for doc, _, _ in duplicates],
+                        )
+                    if len(touched_clusters) >= 200:
+                        self._refresh_clusters(touched_clusters)
+                        touched_clusters.clear()
+                reused = []
+                if reuse_vectors:
+                    reused = [(doc, chunk_id) for doc, chunk_id in to_embed if doc.metadata["chunk_hash"] in reuse_vectors]
+                    to_embed = [(doc, chunk_id) for doc, chunk_id in to_embed if doc.metadata["chunk_hash"] not in reuse_vectors]
+                pending.add(
+                    source,
+                    {
+                        "mtime": stat.st_mtime,
+                        "size": stat.st_size,
+                        "content_hash": content_hash,
+                        "chunk_ids": list(chunks),
+                        "epoch": epoch,
+                    },
+                    len(to_embed) + len(reused),
+                )
+                if reused:
+                    docs = [doc for doc, _ in reused]
+                    self._upsert(
+                        docs,
+                        [chunk_id for _, chunk_id in reused],
+                        [reuse_vectors[doc.metadata["chunk_hash"]] for doc in docs],
+                    )
+                    self.stats["chunks_reused"] += len(reused)
+                    pending.complete([source] * len(reused))
+                yield from to_embed
+            if stale_buffer:
+                self._delete_ids(stale_buffer)
+            if summaries:
+                self._index_summaries(summaries)
+            if links:
+                self._link_graph.set_links(links)
+            if touched_clusters:
+                self._refresh_clusters(touched_clusters)
+
+        def _commit(docs, ids, vectors):
+            self._upsert(docs, ids, vectors)
+            self.stats["chunks_added"] += len(ids)
+            pending.complete([doc.metadata.get("source") for doc in docs])
+
+        try:
+            self._scheduler.run(_prefetch(_diff(), self._queue_size), _commit)
+        finally:
+            # Checkpoint every fully committed file, even when the run fails.
+            pending.flush()
+
+    def _upsert(self, docs, ids, vectors):
+        docs = self._with_cluster_metadata(docs, ids)
+        upsert_batch(self._vector_store, docs, ids, vectors, store_text=self._store_text)
+        if self._lexical_index is not None:
+            self._lexical_index.upsert(ids, docs)
+
+    def _backfill_lexical_index(self, page_size=500):
+        offset = 0
+        while True:
+            result = self._vector_store._collection.get(
+                include=["documents", "metadatas"],
+                limit=page_size,
+                offset=offset,
+            )
+            ids = result.get("ids", [])
+            if not ids:
+                break
+            docs = [
+                Document(page_content=text or "", metadata=metadata or {}, id=chunk_id)
+                for chunk_id, text, metadata in zip(ids, result.get("documents", []), result.get("metadatas", []))
+            ]
+            docs = [doc for doc in hydrate_chunks(docs) if doc.page_content]
+            self._lexical_index.upsert([doc.id for doc in docs], docs)
+            offset += len(ids)
+        if self._dedup is not None:
+            for docs in self._dedup.iter_members(page_size):
+                self._lexical_index.upsert([doc.id for doc in docs], docs)
+
+    def _update_metadata(self, chunks, ids):
+        if self._dedup is not None and ids:
+            # Duplicate members have no row of their own; their metadata only
+            # feeds the canonical row of their cluster.
+            members, touched = self._dedup.update([(chunks[chunk_id], chunk_id) for chunk_id in ids])
+            ids = set(ids) - members
+            self._refresh_clusters(touched - ids)
+            if members and self._lexical_index is not None:
+                self._lexical_index.upsert(sorted(members), [chunks[chunk_id] for chunk_id in sorted(members)])
+        for batch in chunked(sorted(ids), 200):
+            if self._rewrite_documents:
+                # Switching chunk_storage rewrites rows with their stored vectors;
+                # Chroma would try to re-embed a documents-only update.
+                result = self._vector_store._collection.get(ids=batch, include=["embeddings"])
+                vectors = dict(zip(result.get("ids", []), result.get("embeddings", [])))
+                batch = [chunk_id for chunk_id in batch if chunk_id in vectors]
+                self._upsert(
+                    [chunks[chunk_id] for chunk_id in batch],
+                    batch,
+                    [vectors[chunk_id] for chunk_id in batch],
+                )
+                continue
+            docs = self._with_cluster_metadata([chunks[chunk_id] for chunk_id in batch], batch)
+            self._vector_store._collection.update(
+                ids=batch,
+                metadatas=[doc.metadata for doc in docs],
+            )
+            if self._lexical_index is not None:
+                self._lexical_index.upsert(batch, docs)
+
+    def _with_cluster_metadata(self, docs, ids):
+        if self._dedup is None:
+            return docs
+        extra = self._dedup.cluster_metadata(ids)
+        if not extra:
+            return docs
+        return [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, **extra[chunk_id]}, id=chunk_id)
+            if chunk_id in extra else doc
+            for doc, chunk_id in zip(docs, ids)
+        ]
+
+    def _refresh_clusters(self, cluster_ids):
+        canonical = self._dedup.canonical_metadata(cluster_ids)
+        for batch in chunked(sorted(canonical), 200):
+            extra = self._dedup.cluster_metadata(batch)
+            metadatas = [{**canonical[cluster_id], **extra.get(cluster_id, {})} for cluster_id in batch]
+            # Rows still waiting for their embedding are skipped here and get
+            # the same metadata when they are upserted.
+            self._vector_store._collection.update(ids=batch, metadatas=metadatas)
+            if self._lexical_index is not None:
+                self._lexical_index.update_metadata(batch, metadatas)
+
+    def _promote(self, promotions):
+        """Give each member that inherits a removed canonical row its own vector.
+
+        The old vector is reused only when the heir's text is identical;
+        otherwise the heir is embedded, since a near-duplicate's text differs.
+        """
+        old_hashes = {}
+        for batch in chunked([old_id for old_id, _ in promotions], 200):
+            result = self._vector_store._collection.get(ids=batch, include=["metadatas", "embeddings"])
+            vectors = result.get("embeddings")
+            if vectors is None:
+                vectors = []
+            for old_id, metadata, vector in zip(result.get("ids", []), result.get("metadatas") or [], vectors):
+                old_hashes[old_id] = ((metadata or {}).get("chunk_hash"), vector)
+        missing = []
+        for batch in chunked(promotions, 200):
+            ready = []
+            for old_id, doc in batch:
+                old_hash, vector = old_hashes.get(old_id, (None, None))
+                if vector is not None and old_hash and old_hash == text_hash(doc.page_content):
+                    ready.append((doc, vector))
+                else:
+                    missing.append((doc, doc.id))
+            if ready:
+                self._upsert(
+                    [doc for doc, _ in ready],
+                    [doc.id for doc, _ in ready],
+                    [vector for _, vector in ready],
+                )
+        if missing:
+            self.stats["chunks_added"] += len(missing)
+            self._scheduler.run(missing, self._upsert)
+
+    def _index_summaries(self, items):
+        def _commit(docs, ids, vectors):
+            upsert_batch(self._note_store, docs, ids, vectors)
+
+        self._scheduler.run(list(items), _commit)
+
+    def _backfill_note_index(self, vault_path):
+        summaries = []
+        for source, _ in self._discover(vault_path):
+            try:
+                with open(source, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError as e:
+                print(f"Error reading file {source}: {e}")
+                continue
+            metadata = note_metadata(source, text, vault_path)
+            summaries.append((summarize_note(source, text, metadata), note_id(source)))
+            if len(summaries) >= 256:
+                self._index_summaries(summaries)
+                summaries.clear()
+        self._index_summaries(summaries)
+
+    def _backfill_link_graph(self, vault_path):
+        links = {}
+        for source, _ in discover_files(vault_path):
+            try:
+                with open(source, "r", encoding="utf-8") as f:
+                    links[source] = extract_links(f.read())
+            except OSError as e:
+                print(f"Error reading file {source}: {e}")
+                continue
+            if len(links) >= 256:
+                self._link_graph.set_links(links)
+                links.clear()
+        self._link_graph.set_links(links)
+
+    def _remove_sources(self, sources, previous_ids):
+        for source in sources:
+            stale_ids = previous_ids(source)
+            self._manifest.add_pending_deletes(stale_ids)
+            self._delete_ids(stale_ids)
+            self.stats["files_deleted"] += 1
+        if self._note_store is not None and sources:
+            for batch in chunked([note_id(source) for source in sources], 200):
+                self._note_store._collection.delete(ids=batch)
+        if self._link_graph is not None:
+            self._link_graph.delete(sources)
+        self._manifest.delete(sources)
+
+    def _sweep_orphans(self, page_size=1000):
+        # Chunks the manifest does not list (left by older versions or manual
+        # edits) are what a destructive reindex used to clear out.
+        offset = 0
+        while True:
+            result = self._vector_store._collection.get(
+                include=["metadatas"],
+                limit=page_size,
+                offset=offset,
+            )
+            ids = result.get("ids", [])
+            if not ids:
+                break
+            sources = [(metadata or {}).get("source") for metadata in result.get("metadatas", [])]
+            expected = self._manifest.get_chunk_ids_many({source for source in sources if source})
+            expected = {source: set(chunk_ids) for source, chunk_ids in expected.items()}
+            orphans = [
+                chunk_id
+                for chunk_id, source in zip(ids, sources)
+                if chunk_id not in expected.get(source, ())
+            ]
+            self._manifest.add_pending_deletes(orphans)
+            offset += len(ids)
+        self._drain_pending_deletes()
+
+    def _drain_pending_deletes(self):
+        while True:
+            batch = self._manifest.pending_deletes(limit=200)
+            if not batch:
+                return
+            self._delete_ids(batch)
+
+    def _delete_ids(self, ids):
+        if self._dedup is not None and ids:
+            touched, promotions = self._dedup.remove(ids)
+            if promotions:
+                self._promote(promotions)
+            self._refresh_clusters(touched)
+        for batch in chunked(list(ids), 200):
+            self._vector_store._collection.delete(ids=batch)
+            if self._lexical_index is not None:
+                self._lexical_index.delete(batch)
+            self._manifest.remove_pending_deletes(batch)
+            self.stats["chunks_deleted"] += len(batch)
+
+
+class ShardedVaultIndexer:
+    """Routes notes to one VaultIndexer per shard.
+
+    Shards share the embedding scheduler and the link graph; everything else
+    (collection, manifest, lexical and dedup indexes) is per shard, so one
+    shard can be reindexed without touching the others.
+    """
+
+    def __init__(self, factory, vault_path, scheduler):
+        self._factory = factory
+        self._vault_path = vault_path
+        self._scheduler = scheduler
+        self._indexers = {}
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def dedup_index(self):
+        indexers = self._indexers
+        if not any(indexer.dedup_index is not None for indexer in indexers.values()):
+            return None
+        return ShardedDedupIndex(lambda shard: indexers[shard].dedup_index, lambda: list(indexers))
+
+    @property
+    def stats(self):
+        totals = {}
+        for indexer in self._indexers.values():
+            for key, value in indexer.stats.items():
+                if key != "reindex_epoch":
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def indexer(self, shard):
+        if shard not in self._indexers:
+            self._indexers[shard] = self._factory(shard)
+        return self._indexers[shard]
+
+    def shards(self):
+        """Current shards plus shards indexed earlier whose folder has since gone."""
+        shards = dict.fromkeys(shard_names(self._vault_path))
+        root = shards_root()
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                path = os.path.join(root, name, "index_manifest.sqlite3")
+                if os.path.exists(path):
+                    shard = create_index_manifest(os.path.dirname(path)).get_meta("shard")
+                    if shard:
+                        shards.setdefault(shard)
+        return list(shards)
+
+    def reindex_pending(self, shards=None):
+        return any(self.indexer(shard).reindex_pending() for shard in shards or self.shards())
+
+    def sync_vault(self, vault_path, reindex=False, shards=None, recreate_collection=False):
+        self._vault_path = vault_path
+        for shard in shards or self.shards():
+            self.indexer(shard).sync_vault(vault_path, reindex=reindex, recreate_collection=recreate_collection)
+        return self.stats
+
+    def sources_under(self, directory):
+        # Read from the manifests directly: this is called from the watcher's
+        # thread, which must not create indexers.
+        return [
+            source
+            for shard in self.shards()
+            for source in create_index_manifest(shard_directory(shard)).sources_under(directory)
+        ]
+
+    def sync_paths(self, changed=(), deleted=(), moved=None):
+        routed = {}
+
+        def _route(shard):
+            return routed.setdefault(shard, {"changed": [], "deleted": [], "moved": {}})
+
+        for source in changed:
+            _route(shard_of(source, self._vault_path))["changed"].append(source)
+        for source in deleted:
+            _route(shard_of(source, self._vault_path))["deleted"].append(source)
+        for old, new in (moved or {}).items():
+            old_shard = shard_of(old, self._vault_path)
+            new_shard = shard_of(new, self._vault_path)
+            if old_shard == new_shard:
+                _route(old_shard)["moved"][old] = new
+            else:
+                # Chunks cannot move between collections, so a cross-shard
+                # rename is a delete in one shard and a new note in the other.
+                _route(old_shard)["deleted"].append(old)
+                _route(new_shard)["changed"].append(new)
+        for shard, batch in routed.items():
+            self.indexer(shard).sync_paths(batch["changed"], batch["deleted"], batch["moved"])
+        return self.stats
+
+
+def create_vault_indexer(vector_store, workers=1, batch_size=None, max_in_flight=None):
+    """Build the indexer for vector_store; a ShardedVectorStore gets one indexer per shard."""
+    scheduler = create_embedding_scheduler(
+        vector_store.embeddings,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+    )
+    vault_path = get_setting("vault_path")
+    if not isinstance(vector_store, ShardedVectorStore):
+        return VaultIndexer(
+            vector_store,
+            create_index_manifest(),
+            scheduler,
+            chunking_mode=get_setting("chunking_mode", default="recursive"),
+            workers=workers,
+            queue_size=get_setting("index_queue_size", default=256),
+            lexical_index=create_lexical_index(),
+            note_store=get_note_store() if note_index_enabled() else None,
+            vault_path=vault_path,
+            link_graph=create_link_graph(),
+            dedup_index=create_dedup_index(),
+            chunk_storage=get_setting("chunk_storage", default="text"),
+        )
+
+    link_graph = create_link_graph()
+    note_store = get_sharded_vector_store(vault_path, "personal_vault_notes") if note_index_enabled() else None
+
+    def _shard_indexer(shard):
+        directory = shard_directory(shard)
+        return VaultIndexer(
+            vector_store.shard_store(shard),
+            create_index_manifest(directory),
+            scheduler,
+            chunking_mode=get_setting("chunking_mode", default="recursive"),
+            workers=workers,
+            queue_size=get_setting("index_queue_size", default=256),
+            lexical_index=create_lexical_index(directory),
+            note_store=note_store.shard_store(shard) if note_store is not None else None,
+            vault_path=vault_path,
+            link_graph=link_graph,
+            dedup_index=create_dedup_index(directory),
+            chunk_storage=get_setting("chunk_storage", default="text"),
+            shard=shard,
+        )
+
+    return ShardedVaultIndexer(_shard_indexer, vault_path, scheduler)
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import sqlite3
+
+from langchain_core.documents import Document
+
+from core.config import get_setting
+
+_TERM_RE = re.compile(r"[\w][\w\-./#@]*", re.UNICODE)
+
+
+def _match_expression(query):
+    # Each whitespace term becomes a quoted FTS5 phrase, so ids like
+    # "PROJ-4821" or "core/rag_store.py" match their tokens in order.
+    terms = []
+    for term in _TERM_RE.findall(query):
+        term = term.strip("-./#@")
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"')
+    return " OR ".join(dict.fromkeys(terms))
+
+
+def where_sql(where, column="t.metadata"):
+    """Translate a Chroma where clause ($eq, $in, $and, $or) into SQL over the metadata JSON."""
+    if "$and" in where or "$or" in where:
+        operator = "$and" if "$and" in where else "$or"
+        parts = [where_sql(clause, column) for clause in where[operator]]
+        joiner = " AND " if operator == "$and" else " OR "
+        return "(" + joiner.join(sql for sql, _ in parts) + ")", [p for _, params in parts for p in params]
+    sql, params = [], []
+    for key, value in where.items():
+        path = '$."' + key.replace('"', '""') + '"'
+        if isinstance(value, dict):
+            operator, value = next(iter(value.items()))
+            if operator == "$in":
+                if not value:
+                    sql.append("0")
+                    continue
+                sql.append(f"json_extract({column}, ?) IN ({','.join('?' for _ in value)})")
+                params.extend([path, *value])
+                continue
+            if operator != "$eq":
+                raise ValueError(f"Unsupported lexical filter operator: {operator}")
+        sql.append(f"json_extract({column}, ?) = ?")
+        params.extend([path, value])
+    return "(" + " AND ".join(sql) + ")", params
+
+
+class LexicalIndex:
+    """BM25 inverted index over indexed chunks, backed by SQLite FTS5."""
+
+    def __init__(self, path):
+        self._path = path
+        self._ensure_schema()
+
+    def count(self):
+        with sqlite3.connect(self._path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM chunk_ids").fetchone()[0]
+
+    def upsert(self, ids, docs):
+        if not ids:
+            return
+        with sqlite3.connect(self._path) as conn:
+            self._delete(conn, ids)
+            for chunk_id, doc in zip(ids, docs):
+                cursor = conn.execute(
+                    "INSERT INTO chunk_text (content, source, metadata) VALUES (?, ?, ?)",
+                    (
+                        doc.page_content,
+                        doc.metadata.get("source", ""),
+                        json.dumps(doc.metadata),
+                    ),
+                )
+                conn.execute(
+                    "INSERT INTO chunk_ids (chunk_id, row_id) VALUES (?, ?)",
+                    (chunk_id, cursor.lastrowid),
+                )
+            conn.commit()
+
+    def update_metadata(self, ids, metadatas):
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany(
+                """
+                UPDATE chunk_text SET metadata = ?
+                WHERE rowid = (SELECT row_id FROM chunk_ids WHERE chunk_id = ?)
+                """,
+                [(json.dumps(metadata), chunk_id) for chunk_id, metadata in zip(ids, metadatas)],
+            )
+            conn.commit()
+
+    def delete(self, ids):
+        if not ids:
+            return
+        with sqlite3.connect(self._path) as conn:
+            self._delete(conn, ids)
+            conn.commit()
+
+    def clear(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("DELETE FROM chunk_text")
+            conn.execute("DELETE FROM chunk_ids")
+            conn.commit()
+
+    def search(self, query, k=10, where=None):
+        """Return up to k (chunk_id, Document, bm25_score) tuples, best first.
+
+        where takes the same equality clauses as Chroma and is applied in the
+        query, before the limit.
+        """
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        filter_sql, filter_params = where_sql(where) if where else ("1", [])
+        sql = f"""
+            SELECT i.chunk_id, t.content, t.metadata, bm25(chunk_text) AS score
+            FROM chunk_text t
+            JOIN chunk_ids i ON i.row_id = t.rowid
+            WHERE chunk_text MATCH ? AND {filter_sql}
+            ORDER BY score LIMIT ?
+        """
+        with sqlite3.connect(self._path) as conn:
+            try:
+                rows = conn.execute(sql, (expression, *filter_params, k)).fetchall()
+            except sqlite3.OperationalError:
+                return []
+        return [
+            (chunk_id, Document(page_content=content, metadata=json.loads(metadata), id=chunk_id), -score)
+            for chunk_id, content, metadata, score in rows
+        ]
+
+    def _delete(self, conn, ids):
+        for i in range(0, len(ids), 500):
+            batch = list(ids[i : i + 500])
+            placeholders = ",".join("?" for _ in batch)
+            conn.execute(
+                f"""
+                DELETE FROM chunk_text WHERE rowid IN (
+                    SELECT row_id FROM chunk_ids WHERE chunk_id IN ({placeholders})
+                )
+                """,
+                batch,
+            )
+            conn.execute(f"DELETE FROM chunk_ids WHERE chunk_id IN ({placeholders})", batch)
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute(
+                """
+                CREATE VIRTUAL TABLE
+                    IF NOT EXISTS chunk_text USING fts5 (
+                        content,
+                        source UNINDEXED,
+                        metadata UNINDEXED,
+                        tokenize = "unicode61 remove_diacritics 2 tokenchars '_'"
+                    )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS chunk_ids (
+                        chunk_id TEXT PRIMARY KEY,
+                        row_id INTEGER NOT NULL
+                    )
+                """
+            )
+            conn.commit()
+
+
+def create_lexical_index(directory=None):
+    # Only hybrid retrieval reads the BM25 index, and it holds a full copy of
+    # every chunk's text (even with chunk_storage "offsets").
+    enabled = get_setting("lexical_index", default=get_setting("retrieval_mode", default="vector") == "hybrid")
+    if not enabled:
+        return None
+    path = None if directory else get_setting("lexical_index_path")
+    if not path:
+        persist_dir = directory or get_setting("chroma_persist_dir", required=True)
+        path = os.path.join(persist_dir, "lexical_index.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return LexicalIndex(path)
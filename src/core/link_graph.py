@@ -0,0 +1,185 @@
+import os
+import re
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+from core.config import get_setting
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# File types Obsidian opens as attachments (plus common documents); any
+# other suffix is part of a note name, as in [[node.js]] or [[v1.2]].
+_ATTACHMENT_EXTENSIONS = frozenset(
+    {
+        ".avif", ".bmp", ".gif", ".jpeg", ".jpg", ".png", ".svg", ".webp",
+        ".flac", ".m4a", ".mp3", ".ogg", ".wav", ".3gp",
+        ".mkv", ".mov", ".mp4", ".ogv", ".webm",
+        ".pdf", ".canvas", ".base",
+        ".csv", ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx", ".zip",
+    }
+)
+_WIKILINK_RE = re.compile(r"!?\[\[([^\]|#^\n]+)(?:[#^][^\]|\n]*)?(?:\|[^\]\n]*)?\]\]")
+
+
+def note_name(source):
+    return Path(source).stem.lower()
+
+
+def _link_target(raw):
+    target = raw.strip().replace("\\", "/").lower()
+    if target.endswith(".md"):
+        target = target[:-3]
+    elif Path(target).suffix in _ATTACHMENT_EXTENSIONS:
+        # Embedded images, PDFs and other attachments are not notes.
+        return None
+    return target.strip("/") or None
+
+
+def extract_links(text):
+    """Count [[wikilink]] targets outside code blocks, keyed by lowercased link path."""
+    links = Counter()
+    in_fence = False
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence or "[[" not in line:
+            continue
+        for match in _WIKILINK_RE.finditer(line):
+            target = _link_target(match.group(1))
+            if target:
+                links[target] += 1
+    return dict(links)
+
+
+def _matches(source, target):
+    # [[Folder/Note]] only resolves to notes whose path ends with that folder.
+    if "/" not in target:
+        return True
+    return source.replace("\\", "/").lower().endswith("/" + target + ".md")
+
+
+class LinkGraph:
+    """Adjacency index of wikilinks between notes, backed by SQLite.
+
+    Links are stored once per (source, target) pair with a count and indexed
+    in both directions, so links and backlinks of a note are read in
+    O(degree) without touching the vault.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._ensure_schema()
+
+    def count(self):
+        with sqlite3.connect(self._path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def set_links(self, entries):
+        """Replace the outgoing links of each note in entries ({source: {target: count}})."""
+        if not entries:
+            return
+        with sqlite3.connect(self._path) as conn:
+            for source, links in entries.items():
+                conn.execute("DELETE FROM links WHERE source = ?", (source,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO notes (source, name) VALUES (?, ?)",
+                    (source, note_name(source)),
+                )
+                conn.executemany(
+                    "INSERT INTO links (source, target, target_name, weight) VALUES (?, ?, ?, ?)",
+                    [
+                        (source, target, target.rsplit("/", 1)[-1], weight)
+                        for target, weight in links.items()
+                    ],
+                )
+            conn.commit()
+
+    def delete(self, sources):
+        if not sources:
+            return
+        with sqlite3.connect(self._path) as conn:
+            conn.executemany("DELETE FROM links WHERE source = ?", [(source,) for source in sources])
+            conn.executemany("DELETE FROM notes WHERE source = ?", [(source,) for source in sources])
+            conn.commit()
+
+    def clear(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute("DELETE FROM links")
+            conn.execute("DELETE FROM notes")
+            conn.commit()
+
+    def neighbours(self, source):
+        """Return {neighbour source: link count} over links and backlinks of source."""
+        weights = Counter()
+        with sqlite3.connect(self._path) as conn:
+            outgoing = conn.execute(
+                """
+                SELECT n.source, l.target, l.weight
+                FROM links l
+                JOIN notes n ON n.name = l.target_name
+                WHERE l.source = ?
+                """,
+                (source,),
+            )
+            for neighbour, target, weight in outgoing:
+                if _matches(neighbour, target):
+                    weights[neighbour] += weight
+            backlinks = conn.execute(
+                "SELECT source, target, weight FROM links WHERE target_name = ?",
+                (note_name(source),),
+            )
+            for neighbour, target, weight in backlinks:
+                if _matches(source, target):
+                    weights[neighbour] += weight
+        weights.pop(source, None)
+        return dict(weights)
+
+    def top_neighbours(self, sources, limit=3):
+        """Rank notes linked to or from any of sources by total link count."""
+        sources = list(dict.fromkeys(sources))
+        totals = Counter()
+        for source in sources:
+            totals.update(self.neighbours(source))
+        for source in sources:
+            totals.pop(source, None)
+        return [source for source, _ in totals.most_common(limit)]
+
+    def _ensure_schema(self):
+        with sqlite3.connect(self._path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS notes (
+                        source TEXT PRIMARY KEY,
+                        name TEXT NOT NULL
+                    ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE
+                    IF NOT EXISTS links (
+                        source TEXT NOT NULL,
+                        target TEXT NOT NULL,
+                        target_name TEXT NOT NULL,
+                        weight INTEGER NOT NULL,
+                        PRIMARY KEY (source, target)
+                    ) WITHOUT ROWID
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS notes_by_name ON notes (name)")
+            conn.execute("CREATE INDEX IF NOT EXISTS links_by_target ON links (target_name)")
+            conn.commit()
+
+
+def create_link_graph():
+    # Only neighbour expansion reads the graph, so by default it is kept only then.
+    if not get_setting("link_graph", default=bool(get_setting("retrieval_link_neighbours", default=0))):
+        return None
+    path = get_setting("link_graph_path")
+    if not path:
+        persist_dir = get_setting("chroma_persist_dir", required=True)
+        path = os.path.join(persist_dir, "link_graph.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return LinkGraph(path)
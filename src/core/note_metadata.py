@@ -0,0 +1,142 @@
+import datetime
+import re
+from pathlib import Path, PurePath
+
+import yaml
+
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+_TAG_RE = re.compile(r"(?:^|(?<=[\s(\[,]))#([\w][\w/-]*)", re.UNICODE)
+
+# Chroma metadata values must be scalars, so tags and folders are stored as
+# one boolean key each ("tag:meeting", "folder:Projects/Alpha") and filters
+# become plain equality clauses that Chroma evaluates inside the index.
+TAG_PREFIX = "tag:"
+FOLDER_PREFIX = "folder:"
+PROPERTY_PREFIX = "fm:"
+
+
+def split_frontmatter(text):
+    """Return (frontmatter dict, body) for a note with an optional YAML header."""
+    if not text.startswith("---\n") and not text.startswith("---\r\n"):
+        return {}, text
+    end = text.find("\n---", 4)
+    if end == -1:
+        return {}, text
+    body_start = text.find("\n", end + 4)
+    body = text[body_start + 1:] if body_start != -1 else ""
+    try:
+        frontmatter = yaml.safe_load(text[4:end])
+    except yaml.YAMLError:
+        return {}, body
+    return (frontmatter if isinstance(frontmatter, dict) else {}), body
+
+
+def normalize_tag(tag):
+    return str(tag).strip().lstrip("#").strip().lower()
+
+
+def normalize_folder(folder):
+    return PurePath(str(folder).replace("\\", "/")).as_posix().strip("/.")
+
+
+def inline_tags(body):
+    """Collect #tags outside code blocks and inline code."""
+    tags = []
+    in_fence = False
+    for line in body.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        for match in _TAG_RE.finditer(_INLINE_CODE_RE.sub("", line)):
+            tag = match.group(1).rstrip("/-")
+            # Obsidian requires at least one non-numeric character.
+            if tag and not tag.replace("/", "").replace("-", "").isdigit():
+                tags.append(tag)
+    return tags
+
+
+def _frontmatter_tags(frontmatter):
+    value = frontmatter.get("tags", frontmatter.get("tag"))
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return value.replace(",", " ").split()
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+def _scalar(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_scalar(item) for item in value if item is not None)
+    if isinstance(value, dict):
+        return None
+    return str(value)
+
+
+def note_metadata(source, text, vault_path=None):
+    """Chunk metadata derived from a note's frontmatter, #tags and folder."""
+    frontmatter, body = split_frontmatter(text)
+    metadata = {}
+
+    folder = Path(source).parent
+    if vault_path:
+        try:
+            folder = folder.relative_to(vault_path)
+        except ValueError:
+            pass
+    folder = normalize_folder(folder)
+    metadata["folder"] = folder
+    parts = folder.split("/") if folder else []
+    for i in range(len(parts)):
+        metadata[FOLDER_PREFIX + "/".join(parts[: i + 1])] = True
+
+    tags = {}
+    for tag in _frontmatter_tags(frontmatter) + inline_tags(body):
+        tag = normalize_tag(tag)
+        if not tag:
+            continue
+        tags.setdefault(tag, None)
+        # Nested tags (#project/alpha) also match their parents, as in Obsidian.
+        segments = tag.split("/")
+        for i in range(1, len(segments)):
+            tags.setdefault("/".join(segments[:i]), None)
+    if tags:
+        metadata["tags"] = ", ".join(tags)
+        for tag in tags:
+            metadata[TAG_PREFIX + tag] = True
+
+    for key, value in frontmatter.items():
+        if key in ("tags", "tag") or value is None:
+            continue
+        value = _scalar(value)
+        if value is not None:
+            metadata[PROPERTY_PREFIX + str(key).lower()] = value
+    return metadata
+
+
+def metadata_filter(folder=None, tags=None, properties=None):
+    """Build a Chroma where clause, or None when nothing is filtered."""
+    clauses = []
+    if folder:
+        folder = normalize_folder(folder)
+        if folder:
+            clauses.append({FOLDER_PREFIX + folder: True})
+    for tag in tags or []:
+        tag = normalize_tag(tag)
+        if tag:
+            clauses.append({TAG_PREFIX + tag: True})
+    for key, value in (properties or {}).items():
+        clauses.append({PROPERTY_PREFIX + str(key).lower(): _scalar(value)})
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
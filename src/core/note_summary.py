@@ -0,0 +1,61 @@
+import hashlib
+import re
+from collections import Counter
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from core.note_metadata import split_frontmatter
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = set(
+    "a an and are as at be but by for from has have i in is it its of on or that the "
+    "this to was were will with you your we our they their not no so if then than".split()
+)
+
+
+def note_id(source) -> str:
+    return hashlib.sha256(f"note:{source}".encode("utf-8")).hexdigest()
+
+
+def extractive_summary(text, max_sentences=4, max_chars=800):
+    """Pick the sentences whose words are most frequent in the note, in note order."""
+    body = _HEADING_RE.sub("", text)
+    sentences = [
+        " ".join(sentence.split())
+        for paragraph in re.split(r"\n\s*\n", body)
+        for sentence in _SENTENCE_RE.split(paragraph)
+        if len(sentence.split()) >= 4
+    ]
+    if not sentences:
+        return ""
+    frequencies = Counter(
+        word
+        for word in _WORD_RE.findall(body.lower())
+        if word not in _STOPWORDS and not word.isdigit()
+    )
+
+    def _score(item):
+        index, sentence = item
+        words = [word for word in _WORD_RE.findall(sentence.lower()) if word in frequencies]
+        lead_bonus = 1.5 if index < 2 else 1.0
+        return lead_bonus * sum(frequencies[word] for word in words) / (len(words) + 5)
+
+    ranked = sorted(enumerate(sentences), key=_score, reverse=True)[:max_sentences]
+    summary = " ".join(sentence for _, sentence in sorted(ranked))
+    return summary[:max_chars]
+
+
+def summarize_note(source, text, metadata=None):
+    _, text = split_frontmatter(text)
+    title = Path(source).stem
+    headings = [match.group(2) for match in _HEADING_RE.finditer(text)][:20]
+    parts = [f"Title: {title}"]
+    if headings:
+        parts.append("Headings: " + "; ".join(headings))
+    summary = extractive_summary(text)
+    if summary:
+        parts.append("Summary: " + summary)
+    return Document(page_content="\n".join(parts), metadata={**(metadata or {}), "source": source, "title": title})
@@ -1,33 +1,104 @@
 import os.path
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from langchain.agents import create_agent
 from langchain.chat_models import init_chat_model
 from langchain.tools import tool
+from langchain_core.documents import Document
 
+from core.chunk_dedup import create_dedup_index
+from core.chunk_reader import hydrate_chunks
 from core.config import get_setting, load_env
-from core.rag_store import get_vector_store
+from core.context_assembler import assemble_context
+from core.file_cache import create_file_cache
+from core.index_pipeline import create_vault_indexer
+from core.lexical_index import create_lexical_index
+from core.link_graph import create_link_graph
+from core.note_metadata import metadata_filter
+from core.rag_store import get_note_store, get_sharded_vector_store, get_vector_store
+from core.retrieval import diverse_search, expand_duplicates, hierarchical_search, hybrid_search
+from core.shards import ShardedDedupIndex, ShardedLexicalIndex, shard_directory, shard_names, sharding_mode
 
 load_env()
 model = init_chat_model(get_setting("chat_model", required=True))
-vector_store = get_vector_store()
 vault_path = get_setting("vault_path", required=True)
+file_cache = create_file_cache()
+retrieval_mode = get_setting("retrieval_mode", default="vector")
+link_neighbours = get_setting("retrieval_link_neighbours", default=0)
+link_graph = create_link_graph() if link_neighbours else None
+
+
+def _current_shards():
+    return shard_names(vault_path)
+
+
+if sharding_mode():
+    # Each search fans out to every shard on a thread pool and merges the top k.
+    vector_store = get_sharded_vector_store(vault_path)
+    lexical_index = (
+        ShardedLexicalIndex(lambda shard: create_lexical_index(shard_directory(shard)), _current_shards)
+        if retrieval_mode == "hybrid"
+        else None
+    )
+    note_store = get_sharded_vector_store(vault_path, "personal_vault_notes") if retrieval_mode == "hierarchical" else None
+    dedup_index = ShardedDedupIndex(lambda shard: create_dedup_index(shard_directory(shard)), _current_shards)
+else:
+    vector_store = get_vector_store()
+    lexical_index = create_lexical_index() if retrieval_mode == "hybrid" else None
+    note_store = get_note_store() if retrieval_mode == "hierarchical" else None
+    dedup_index = create_dedup_index()
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vault-index")
+_indexer = None
+
+
+def _index_written_note(path):
+    global _indexer
+    try:
+        if _indexer is None:
+            _indexer = create_vault_indexer(vector_store)
+        _indexer.sync_paths(changed=[path])
+    except Exception as e:
+        print(f"Error indexing file {path}: {e}")
 
 
 def summarize_messages(existing_summary, messages):
     """Summarize a list of chat messages into a compact running summary."""
-    if not messages:
+    prompt_text = _summary_prompt(existing_summary, messages)
+    if prompt_text is None:
+        return existing_summary
+    try:
+        response = model.invoke(prompt_text)
+    except Exception:
         return existing_summary
+    content = getattr(response, "content", response)
+    return str(content).strip() or existing_summary
+
+
+async def asummarize_messages(existing_summary, messages):
+    """Async summarize_messages."""
+    prompt_text = _summary_prompt(existing_summary, messages)
+    if prompt_text is None:
+        return existing_summary
+    try:
+        response = await model.ainvoke(prompt_text)
+    except Exception:
+        return existing_summary
+    content = getattr(response, "content", response)
+    return str(content).strip() or existing_summary
+
 
+def _summary_prompt(existing_summary, messages):
     lines = []
-    for message in messages:
+    for message in messages or []:
         role = message.get("role", "unknown").upper()
         content = message.get("content", "")
         if content:
             lines.append(f"{role}: {content}")
     if not lines:
-        return existing_summary
+        return None
 
-    prompt_text = (
+    return (
         "You are summarizing a conversation for future context.\n"
         "Keep it concise (under 300 words) and focus on user goals, decisions, "
         "constraints, and key facts.\n\n"
@@ -36,46 +107,85 @@ def summarize_messages(existing_summary, messages):
         f"{chr(10).join(lines)}\n\n"
         "Updated summary:"
     )
-    try:
-        response = model.invoke(prompt_text)
-    except Exception:
-        return existing_summary
-    content = getattr(response, "content", response)
-    return str(content).strip() or existing_summary
 
 
+def _search(query, where=None):
+    if retrieval_mode == "hybrid":
+        return hybrid_search(vector_store, lexical_index, query, k=10, where=where)
+    if retrieval_mode == "diverse":
+        return diverse_search(
+            vector_store,
+            query,
+            fetch_k=get_setting("retrieval_fetch_k", default=40),
+            min_relevance=get_setting("retrieval_min_relevance", default=0.3),
+            relative_cutoff=get_setting("retrieval_relative_cutoff", default=0.15),
+            per_source_cap=get_setting("retrieval_per_source_cap", default=2),
+            max_files=get_setting("retrieval_max_files", default=5),
+            where=where,
+        )
+    if retrieval_mode == "hierarchical":
+        return hierarchical_search(
+            vector_store,
+            note_store,
+            query,
+            k=10,
+            notes_k=get_setting("retrieval_notes_k", default=8),
+            where=where,
+        )
+    return vector_store.similarity_search(query, k=10, filter=where)
+
+
+def _with_linked_notes(docs):
+    # Neighbours come from the precomputed link graph, so no extra embedding
+    # query is made; the assembler fills them in after the hits if budget allows.
+    if link_graph is None or not docs:
+        return docs
+    sources = [doc.metadata.get("source") for doc in docs if doc.metadata.get("source")]
+    linked = link_graph.top_neighbours(sources, limit=link_neighbours)
+    return docs + [Document(page_content="", metadata={"source": source, "linked": True}) for source in linked]
+
+
+def _read_note(source_path):
+    return file_cache.read_text(os.path.join(vault_path, source_path))
 
-@tool(response_format="content_and_artifact")
-def retrieve_context(query: str):
-    """Retrieve information to help answer a query by reading full files."""
-    retrieved_docs = vector_store.similarity_search(query, k=10)
 
-    unique_paths = set()
-    context_parts = []
-
-    for doc in retrieved_docs:
-        source_path = doc.metadata.get("source")
-
-        if source_path and source_path not in unique_paths:
-            unique_paths.add(source_path)
-
-            try:
-                with open(os.path.join(vault_path, source_path), "r", encoding="utf-8") as f:
-                    full_content = f.read()
-
-                context_parts.append(
-                    f"FILE SOURCE: {source_path}\n"
-                    f"{'=' * 30}\n"
-                    f"{full_content}\n"
-                    f"{'=' * 30}"
-                )
-            except Exception as e:
-                print(f"Error reading file {source_path}: {e}")
-
-    if not context_parts:
+@tool(response_format="content_and_artifact")
+def retrieve_context(
+        query: str,
+        folder: str | None = None,
+        tags: list[str] | None = None,
+        properties: dict[str, str] | None = None,
+):
+    """Retrieve information to help answer a query from the matching notes.
+
+    Optionally restrict the search to notes under a vault folder (e.g. "Projects"),
+    notes carrying all of the given tags (e.g. ["meeting"]), or notes whose
+    frontmatter properties equal the given values (e.g. {"status": "active"}).
+    """
+    where = metadata_filter(folder, tags, properties)
+    retrieved_docs = hydrate_chunks(
+        _search(query, where=where),
+        lambda source: os.path.join(vault_path, source),
+    )
+    if dedup_index is not None:
+        retrieved_docs = expand_duplicates(
+            retrieved_docs,
+            dedup_index,
+            where=where,
+            max_sources=get_setting("retrieval_duplicate_sources", default=0),
+        )
+    if where is None:
+        # Linked notes are not checked against filters, so only expand unfiltered searches.
+        retrieved_docs = _with_linked_notes(retrieved_docs)
+
+    serialized, _ = assemble_context(
+        retrieved_docs,
+        _read_note,
+        token_budget=get_setting("context_token_budget", default=8000),
+        neighbour_chunks=get_setting("context_neighbour_chunks", default=1),
+    )
+    if not serialized:
         serialized = "No relevant documents found in the vault."
-    else:
-        serialized = "\n\n".join(context_parts)
 
     return serialized, retrieved_docs
 
@@ -102,6 +212,11 @@ Tags: [[AI Generated]]
         """.strip()
         f.write(full_note)
 
+    # Indexed with the same splitter and ids as build_index, so a later batch
+    # run finds the chunks already present instead of embedding them again.
+    if full_path.endswith(".md") and not os.path.basename(full_path).startswith("."):
+        _index_executor.submit(_index_written_note, str(Path(full_path)))
+
     return f"Content written to {full_path}", full_note
 
 
@@ -112,6 +227,7 @@ prompt = (
     "You have access to two tools:\n"
     "1. `retrieve_context`: Use this tool to find relevant information from the vault. "
     "When you use this tool, you should inform the user that you are searching for information. "
+    "If the user names a folder, tag or note property, pass it as a filter instead of adding it to the query. "
     "2. `write_to_vault`: Use this tool to write new notes to the vault. "
     "You should use this tool when the user asks you to create a new note or when you think it would be helpful to save information for later.\n\n"
     "When answering a question, you should use the following process:\n"
@@ -1,14 +1,17 @@
+import asyncio
 import json
 import uuid
+from contextlib import aclosing
 
 from core.config import get_setting
-from core.rag_agent import agent, summarize_messages
-from storage.chat_history_store import create_history_store
+from storage.chat_history_store import create_async_history_store, create_history_store
 
 try:
     import redis
+    import redis.asyncio as redis_asyncio
 except Exception:
     redis = None
+    redis_asyncio = None
 
 
 class InMemorySessionStore:
@@ -55,6 +58,59 @@ class RedisSessionStore:
         return f"{self._prefix}{session_id}"
 
 
+class AsyncInMemorySessionStore:
+    def __init__(self):
+        self._data = {}
+
+    async def load(self, session_id):
+        return self._data.get(session_id, {"history": [], "summary": ""})
+
+    async def save(self, session_id, state):
+        self._data[session_id] = state
+
+    async def aclose(self):
+        pass
+
+
+class AsyncRedisSessionStore:
+    def __init__(
+            self,
+            host="localhost",
+            port=6379,
+            db=0,
+            prefix="rag:session:",
+    ):
+        # The client keeps its own connection pool, shared by every session using this store.
+        self._client = redis_asyncio.Redis(host=host, port=port, db=db, decode_responses=True)
+        self._prefix = prefix
+
+    async def load(self, session_id):
+        raw = await self._client.get(self._key(session_id))
+        if not raw:
+            return {"history": [], "summary": ""}
+        try:
+            return json.loads(raw)
+        except Exception:
+            return {"history": [], "summary": ""}
+
+    async def save(self, session_id, state):
+        await self._client.set(self._key(session_id), json.dumps(state))
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _key(self, session_id):
+        return f"{self._prefix}{session_id}"
+
+
+def _default_agent():
+    # Imported on first use so sessions given their own agent (benchmarks, the
+    # server) do not build the configured model and vector store.
+    from core import rag_agent
+
+    return rag_agent
+
+
 class RAGSession:
     def __init__(
             self,
@@ -62,13 +118,50 @@ class RAGSession:
             store=None,
             history_store=None,
             history_max_messages=30,
+            agent=None,
+            summarize=None,
     ):
         self._session_id = session_id
         self._store = store or InMemorySessionStore()
         self._history_store = history_store
         self._history_max_messages = history_max_messages
+        self._agent = agent or _default_agent().agent
+        self._summarize = summarize or _default_agent().summarize_messages
+
+    @property
+    def session_id(self):
+        return self._session_id
 
     def process_query(self, query):
+        last_text, artifacts = "", []
+        for event in self.stream_query(query):
+            if event["type"] == "done":
+                last_text, artifacts = event["text"], event["artifacts"]
+        return last_text, artifacts
+
+    def stream_query(self, query):
+        """Answer query, yielding events while the agent works.
+
+        Events are dicts with a "type":
+        - "text": a token delta of the assistant message being written, with
+          the message's text so far in "text" (a new message, e.g. after a
+          tool call, starts again from empty);
+        - "tool_call": the agent called a tool ("name", "args");
+        - "tool_result": a tool returned ("name", "artifact");
+        - "done": the final reply in "text" and the tool calls and artifacts
+          in "artifacts", sent after the history has been saved.
+        """
+        history, summary, messages = self._begin_turn(query)
+        turn = _Turn()
+        for mode, payload in self._agent.stream(
+                {"messages": messages},
+                stream_mode=["messages", "values"],
+        ):
+            yield from turn.feed(mode, payload)
+        self._end_turn(history, summary, turn.last_text)
+        yield {"type": "done", "text": turn.last_text or "", "artifacts": turn.artifacts}
+
+    def _begin_turn(self, query):
         state = self._load_state()
         history = state["history"]
         summary = state["summary"]
@@ -76,42 +169,15 @@ class RAGSession:
         history.append({"role": "user", "content": query})
         self._persist_message("user", query)
         history, summary = self._maybe_summarize(history, summary)
+        return history, summary, _agent_messages(history, summary)
 
-        messages = []
-        if summary:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": f"Conversation summary:\n{summary}",
-                }
-            )
-        messages.extend(history)
-
-        last_text = None
-        artifacts = []
-        for event in agent.stream(
-                {"messages": messages},
-                stream_mode="values",
-        ):
-            message = event["messages"][-1]
-            content = getattr(message, "content", message)
-            if hasattr(message, "tool_calls") and message.tool_calls:
-                artifacts.extend(message.tool_calls)
-            if hasattr(message, "artifact") and message.artifact:
-                artifacts.append(message.artifact)
-            role = getattr(message, "type", None) or getattr(message, "role", "assistant")
-            role_key = role.lower() if isinstance(role, str) else str(role).lower()
-            if role_key in {"ai", "assistant"} and content:
-                text = _extract_text(content).strip()
-                if text:
-                    last_text = text
+    def _end_turn(self, history, summary, last_text):
         if last_text:
             history.append({"role": "assistant", "content": last_text})
             self._persist_message("assistant", last_text)
             history, summary = self._maybe_summarize(history, summary)
 
         self._save_state(history, summary)
-        return last_text or "", artifacts
 
     def _load_state(self):
         state = self._store.load(self._session_id)
@@ -126,7 +192,7 @@ class RAGSession:
         if len(history) <= self._history_max_messages:
             return history, summary
         to_summarize = history[:-self._history_max_messages]
-        summary = summarize_messages(summary, to_summarize)
+        summary = self._summarize(summary, to_summarize)
         history = history[-self._history_max_messages:]
         return history, summary
 
@@ -136,6 +202,174 @@ class RAGSession:
         self._history_store.append_message(self._session_id, role, content)
 
 
+class AsyncRAGSession:
+    """RAGSession for an asyncio event loop, built on agent.astream.
+
+    Stores must be the async ones (see create_async_session). Turns of one
+    session run one at a time; different sessions run concurrently. Cancelling
+    the task running a turn (or closing astream_query early) stops the agent and
+    leaves the session as it was before the query: nothing of the turn is
+    saved, so the query can simply be sent again.
+    """
+
+    def __init__(
+            self,
+            session_id="default",
+            store=None,
+            history_store=None,
+            history_max_messages=30,
+            agent=None,
+            summarize=None,
+    ):
+        self._session_id = session_id
+        self._store = store or AsyncInMemorySessionStore()
+        self._history_store = history_store
+        self._history_max_messages = history_max_messages
+        self._agent = agent or _default_agent().agent
+        self._summarize = summarize or _default_agent().asummarize_messages
+        self._lock = asyncio.Lock()
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    async def aprocess_query(self, query):
+        last_text, artifacts = "", []
+        async for event in self.astream_query(query):
+            if event["type"] == "done":
+                last_text, artifacts = event["text"], event["artifacts"]
+        return last_text, artifacts
+
+    async def astream_query(self, query):
+        """Async stream_query, yielding the same events."""
+        async with self._lock:
+            state = await self._store.load(self._session_id)
+            history = list(state.get("history", []))
+            summary = state.get("summary", "")
+            history.append({"role": "user", "content": query})
+            history, summary = await self._maybe_summarize(history, summary)
+
+            turn = _Turn()
+            async with aclosing(
+                    self._agent.astream(
+                        {"messages": _agent_messages(history, summary)},
+                        stream_mode=["messages", "values"],
+                    )
+            ) as stream:
+                async for mode, payload in stream:
+                    for event in turn.feed(mode, payload):
+                        yield event
+
+            # Written only once the agent has finished, so a cancelled turn
+            # leaves no trace in either store.
+            await self._persist_message("user", query)
+            if turn.last_text:
+                history.append({"role": "assistant", "content": turn.last_text})
+                await self._persist_message("assistant", turn.last_text)
+                history, summary = await self._maybe_summarize(history, summary)
+            await self._store.save(self._session_id, {"history": history, "summary": summary})
+        yield {"type": "done", "text": turn.last_text or "", "artifacts": turn.artifacts}
+
+    async def restore_history(self):
+        """Seed an empty session state from the history store, like restore_session_history."""
+        if not self._history_store:
+            return
+        async with self._lock:
+            state = await self._store.load(self._session_id)
+            if state.get("history"):
+                return
+            rows = await self._history_store.get_recent_messages(self._session_id, limit=self._history_max_messages)
+            history = [{"role": role, "content": content} for role, content, _ in rows]
+            if history:
+                await self._store.save(self._session_id, {"history": history, "summary": state.get("summary", "")})
+
+    async def _maybe_summarize(self, history, summary):
+        if len(history) <= self._history_max_messages:
+            return history, summary
+        to_summarize = history[:-self._history_max_messages]
+        summary = await self._summarize(summary, to_summarize)
+        history = history[-self._history_max_messages:]
+        return history, summary
+
+    async def _persist_message(self, role, content):
+        if not self._history_store:
+            return
+        await self._history_store.append_message(self._session_id, role, content)
+
+
+def _agent_messages(history, summary):
+    messages = []
+    if summary:
+        messages.append(
+            {
+                "role": "system",
+                "content": f"Conversation summary:\n{summary}",
+            }
+        )
+    messages.extend(history)
+    return messages
+
+
+class _Turn:
+    """Turns agent.stream(stream_mode=["messages", "values"]) output into session events."""
+
+    def __init__(self):
+        self.last_text = None
+        self.artifacts = []
+        self._message_id = None
+        self._streamed = ""
+        self._seen = None
+
+    def feed(self, mode, payload):
+        if mode == "messages":
+            chunk, _ = payload
+            # Tool results and replayed messages also pass through here; only
+            # model tokens are streamed.
+            if getattr(chunk, "type", None) != "AIMessageChunk":
+                return []
+            delta = _extract_text(chunk.content)
+            if not delta:
+                return []
+            if chunk.id != self._message_id:
+                self._message_id = chunk.id
+                self._streamed = ""
+            self._streamed += delta
+            return [{"type": "text", "delta": delta, "text": self._streamed}]
+
+        events = []
+        messages = payload["messages"]
+        # Parallel tool calls add several messages in one step.
+        new_messages = messages[-1:] if self._seen is None else messages[self._seen:]
+        self._seen = len(messages)
+        for message in new_messages:
+            content = getattr(message, "content", message)
+            if hasattr(message, "tool_calls") and message.tool_calls:
+                self.artifacts.extend(message.tool_calls)
+                # Whatever the model writes after the tool runs is a new message.
+                self._streamed = ""
+                events.extend(
+                    {"type": "tool_call", "name": call.get("name"), "args": call.get("args", {})}
+                    for call in message.tool_calls
+                )
+            if hasattr(message, "artifact") and message.artifact:
+                self.artifacts.append(message.artifact)
+            role = getattr(message, "type", None) or getattr(message, "role", "assistant")
+            role_key = role.lower() if isinstance(role, str) else str(role).lower()
+            if role_key == "tool":
+                events.append(
+                    {
+                        "type": "tool_result",
+                        "name": getattr(message, "name", None),
+                        "artifact": getattr(message, "artifact", None),
+                    }
+                )
+            if role_key in {"ai", "assistant"} and content:
+                text = _extract_text(content).strip()
+                if text:
+                    self.last_text = text
+        return events
+
+
 def _extract_text(content):
     if content is None:
         return ""
@@ -161,16 +395,7 @@ def _extract_text(content):
 
 def create_session(session_id=str(uuid.uuid4())):
     history_max_messages = get_setting("history_max_messages", default=30)
-    store_type = get_setting("session_store", default="memory")
-    if store_type == "redis":
-        store = RedisSessionStore(
-            host=get_setting("redis_host", default="localhost"),
-            port=get_setting("redis_port", default=6379),
-            db=get_setting("redis_db", default=0),
-            prefix=get_setting("redis_prefix", default="rag:session:"),
-        )
-    else:
-        store = InMemorySessionStore()
+    store = _create_session_store(RedisSessionStore, InMemorySessionStore)
     history_store = create_history_store()
     return RAGSession(
         session_id=session_id,
@@ -178,3 +403,31 @@ def create_session(session_id=str(uuid.uuid4())):
         history_store=history_store,
         history_max_messages=history_max_messages,
     )
+
+
+def create_async_session_store():
+    return _create_session_store(AsyncRedisSessionStore, AsyncInMemorySessionStore)
+
+
+def create_async_session(session_id=None, store=None, history_store=None, agent=None, summarize=None):
+    """Build an AsyncRAGSession; pass store/history_store to share them between sessions."""
+    return AsyncRAGSession(
+        session_id=session_id or str(uuid.uuid4()),
+        store=store or create_async_session_store(),
+        history_store=history_store if history_store is not None else create_async_history_store(),
+        history_max_messages=get_setting("history_max_messages", default=30),
+        agent=agent,
+        summarize=summarize,
+    )
+
+
+def _create_session_store(redis_store, memory_store):
+    store_type = get_setting("session_store", default="memory")
+    if store_type == "redis":
+        return redis_store(
+            host=get_setting("redis_host", default="localhost"),
+            port=get_setting("redis_port", default=6379),
+            db=get_setting("redis_db", default=0),
+            prefix=get_setting("redis_prefix", default="rag:session:"),
+        )
+    return memory_store()
@@ -1,18 +1,100 @@
+import os
+
 from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
 from core.config import get_setting, load_env
+from core.embedding_cache import with_embedding_cache
+from core.flat_store import FlatVectorStore
+from core.shards import ShardedVectorStore, shard_collection, shard_directory, shard_names
+
+# Config keys for Chroma's HNSW index, mapped to collection metadata keys.
+HNSW_SETTINGS = {
+    "hnsw_space": "hnsw:space",
+    "hnsw_construction_ef": "hnsw:construction_ef",
+    "hnsw_search_ef": "hnsw:search_ef",
+    "hnsw_m": "hnsw:M",
+}
+
+
+def get_embeddings():
+    model = get_setting("embedding_model", required=True)
+    dimensions = get_setting("embedding_dimensions")
+    embeddings = GoogleGenerativeAIEmbeddings(model=model, output_dimensionality=dimensions)
+    # Vectors of another size must never be served from the cache.
+    return with_embedding_cache(embeddings, namespace=f"{model}:{dimensions}" if dimensions else model)
+
 
+def collection_metadata():
+    """HNSW parameters from config, as Chroma collection metadata (None when all default)."""
+    metadata = {
+        key: get_setting(setting)
+        for setting, key in HNSW_SETTINGS.items()
+        if get_setting(setting) is not None
+    }
+    return metadata or None
 
-def get_vector_store(persist_directory: str | None = None):
+
+def _warn_on_index_mismatch(store, collection_name, wanted):
+    # Chroma fixes the HNSW parameters when a collection is created, so
+    # changed settings only apply to a recreated collection.
+    current = store._collection.metadata or {}
+    for key, value in (wanted or {}).items():
+        if current.get(key) != value:
+            print(
+                f"Collection {collection_name} was created with {key}={current.get(key, 'default')}; "
+                f"run `uv run build_index.py --recreate-collection` to use {value} "
+                f"(the embedding cache and other indexes are kept)."
+            )
+
+
+def get_vector_store(
+        persist_directory: str | None = None,
+        collection_name: str = "personal_vault",
+        embeddings=None,
+):
     load_env()
     if persist_directory is None:
         persist_directory = get_setting("chroma_persist_dir", required=True)
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model=get_setting("embedding_model", required=True)
-    )
-    return Chroma(
-        collection_name="personal_vault",
-        embedding_function=embeddings,
+    if get_setting("vector_backend", default="chroma") == "flat":
+        return FlatVectorStore(
+            os.path.join(persist_directory, "flat", collection_name),
+            embeddings or get_embeddings(),
+            dtype=get_setting("flat_dtype", default="float32"),
+        )
+    metadata = collection_metadata()
+    store = Chroma(
+        collection_name=collection_name,
+        embedding_function=embeddings or get_embeddings(),
         persist_directory=persist_directory,
+        collection_metadata=metadata,
+    )
+    _warn_on_index_mismatch(store, collection_name, metadata)
+    return store
+
+
+def note_index_enabled():
+    return get_setting(
+        "note_index",
+        default=get_setting("retrieval_mode", default="vector") == "hierarchical",
+    )
+
+
+def get_note_store(persist_directory: str | None = None):
+    return get_vector_store(persist_directory, collection_name="personal_vault_notes")
+
+
+def get_sharded_vector_store(vault_path: str, collection_name: str = "personal_vault"):
+    """One Chroma collection per shard, each persisted under its own directory."""
+    load_env()
+    embeddings = get_embeddings()
+    return ShardedVectorStore(
+        lambda shard: get_vector_store(
+            shard_directory(shard),
+            collection_name=shard_collection(shard, collection_name),
+            embeddings=embeddings,
+        ),
+        lambda: shard_names(vault_path),
+        embeddings,
+        max_workers=get_setting("shard_search_workers", default=None),
     )
@@ -0,0 +1,107 @@
+def chunk_key(doc):
+    if getattr(doc, "id", None):
+        return doc.id
+    return doc.metadata.get("source"), doc.page_content
+
+
+def reciprocal_rank_fusion(ranked_lists, k=10, rrf_k=60):
+    """Merge ranked document lists by summing 1 / (rrf_k + rank) per chunk."""
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ordered[:k]]
+
+
+def expand_duplicates(docs, dedup_index, where=None, max_sources=0):
+    """Map deduplicated hits back to the notes that share their chunk.
+
+    Each cluster hit lists its member sources in metadata["duplicate_sources"]
+    and is followed by up to max_sources member chunks. Under a where filter
+    a canonical chunk from a non-matching note is replaced by the matching
+    members, since the cluster was only found through them.
+    """
+    cluster_ids = {doc.id for doc in docs if doc.id and doc.metadata.get("duplicates")}
+    if not cluster_ids:
+        return docs
+    members = dedup_index.members(cluster_ids, where)
+    keep = dedup_index.matching_clusters(cluster_ids, where) if where else cluster_ids
+    expanded = []
+    for doc in docs:
+        if doc.id not in cluster_ids:
+            expanded.append(doc)
+            continue
+        group = members.get(doc.id, [])
+        if doc.id in keep:
+            doc.metadata["duplicate_sources"] = [member.metadata.get("source") for member in group]
+            expanded.append(doc)
+            expanded.extend(group[:max_sources])
+        else:
+            expanded.extend(group[: max(1, max_sources)])
+    return expanded
+
+
+def _and(*clauses):
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def hybrid_search(vector_store, lexical_index, query, k=10, fetch_k=30, where=None):
+    vector_docs = vector_store.similarity_search(query, k=fetch_k, filter=where)
+    if lexical_index is None:
+        return vector_docs[:k]
+    lexical_docs = [doc for _, doc, _ in lexical_index.search(query, k=fetch_k, where=where)]
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], k=k)
+
+
+def diverse_search(
+        vector_store,
+        query,
+        fetch_k=40,
+        min_relevance=0.3,
+        relative_cutoff=0.15,
+        per_source_cap=2,
+        max_files=5,
+        where=None,
+):
+    """Over-fetch scored hits, drop weak ones and keep a few chunks from a few notes.
+
+    Notes are kept while their best chunk scores within relative_cutoff of the
+    overall best, so a clear winner yields one file and a flat field several.
+    """
+    scored = vector_store.similarity_search_with_relevance_scores(query, k=fetch_k, filter=where)
+    scored = [(doc, score) for doc, score in scored if score >= min_relevance]
+    if not scored:
+        return []
+    scored.sort(key=lambda item: item[1], reverse=True)
+    best = scored[0][1]
+
+    per_source = {}
+    for doc, score in scored:
+        source = doc.metadata.get("source")
+        if source not in per_source:
+            if len(per_source) >= max_files or score < best - relative_cutoff:
+                continue
+            per_source[source] = []
+        if len(per_source[source]) < per_source_cap:
+            per_source[source].append(doc)
+    return [doc for docs in per_source.values() for doc in docs]
+
+
+def hierarchical_search(vector_store, note_store, query, k=10, notes_k=8, where=None):
+    """Find candidate notes by their summary vectors, then search chunks only inside them."""
+    notes = note_store.similarity_search(query, k=notes_k, filter=where)
+    sources = list(dict.fromkeys(doc.metadata.get("source") for doc in notes if doc.metadata.get("source")))
+    if not sources:
+        return vector_store.similarity_search(query, k=k, filter=where)
+    return vector_store.similarity_search(
+        query,
+        k=k,
+        filter=_and(where, {"source": {"$in": sources}}),
+    )
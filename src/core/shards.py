@@ -0,0 +1,164 @@
+import hashlib
+import heapq
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.config import get_setting
+
+ROOT_SHARD = "_root"
+
+
+def sharding_mode():
+    """Return "folder", "hash" or None, from the shard_by setting."""
+    mode = get_setting("shard_by", default="none")
+    return None if mode in (None, "none") else mode
+
+
+def shard_count():
+    return max(1, int(get_setting("shard_count", default=4)))
+
+
+def shard_of(source, vault_path, mode=None):
+    """Shard of a note: its top-level folder, or a stable hash of its vault path."""
+    mode = mode or sharding_mode()
+    relative = Path(os.path.relpath(source, vault_path)).as_posix()
+    if mode == "hash":
+        return f"hash-{zlib.crc32(relative.encode('utf-8')) % shard_count():02d}"
+    parts = relative.split("/")
+    return parts[0] if len(parts) > 1 else ROOT_SHARD
+
+
+def shard_names(vault_path, mode=None):
+    """Current shards of the vault; folder shards come from one top-level listing."""
+    mode = mode or sharding_mode()
+    if mode == "hash":
+        return [f"hash-{i:02d}" for i in range(shard_count())]
+    try:
+        folders = sorted(
+            entry.name
+            for entry in os.scandir(vault_path)
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+    except OSError:
+        folders = []
+    return [ROOT_SHARD] + folders
+
+
+def shard_slug(shard):
+    # Chroma collection names allow [a-zA-Z0-9._-] only; the hash keeps
+    # folders that differ only in punctuation apart.
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "-", shard).strip("-_")[:24] or "shard"
+    return f"{slug}-{hashlib.sha256(shard.encode('utf-8')).hexdigest()[:8]}"
+
+
+def shard_collection(shard, collection_name="personal_vault"):
+    return f"{collection_name}__{shard_slug(shard)}"
+
+
+def shards_root():
+    return os.path.join(get_setting("chroma_persist_dir", required=True), "shards")
+
+
+def shard_directory(shard):
+    """Directory for a shard's manifest and side indexes."""
+    path = os.path.join(shards_root(), shard_slug(shard))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _merge(results, k, key, reverse=False):
+    items = (item for result in results for item in result)
+    if reverse:
+        return heapq.nlargest(k, items, key=key)
+    return heapq.nsmallest(k, items, key=key)
+
+
+class _ShardMap:
+    """Per-shard objects opened on first use; shards() is re-read on every call
+    so folders created after startup are searched without a restart."""
+
+    def __init__(self, factory, shards):
+        self._factory = factory
+        self._shards = shards
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def shard(self, name):
+        with self._lock:
+            if name not in self._opened:
+                self._opened[name] = self._factory(name)
+            return self._opened[name]
+
+    def current(self):
+        return [item for item in (self.shard(name) for name in self._shards()) if item is not None]
+
+
+class ShardedVectorStore(_ShardMap):
+    """Fans searches out to one vector store per shard and merges the top k by distance.
+
+    The query is embedded once; every shard returns its own top k, so the
+    global top k is always among the merged candidates.
+    """
+
+    def __init__(self, factory, shards, embeddings, max_workers=None):
+        super().__init__(factory, shards)
+        self.embeddings = embeddings
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-search")
+
+    def shard_store(self, shard):
+        return self.shard(shard)
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        """Return (Document, distance) pairs, closest first."""
+        vector = self.embeddings.embed_query(query)
+        results = self._executor.map(
+            lambda store: store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter),
+            self.current(),
+        )
+        return _merge(results, k, key=lambda item: item[1])
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        scored = self.similarity_search_with_score(query, k=k, filter=filter)
+        if not scored:
+            return []
+        relevance = self.current()[0]._select_relevance_score_fn()
+        return [(doc, relevance(distance)) for doc, distance in scored]
+
+
+class ShardedLexicalIndex(_ShardMap):
+    """BM25 search over per-shard lexical indexes, merged by score.
+
+    BM25 statistics are per shard, so scores are close to but not exactly
+    what one index over the whole vault would give.
+    """
+
+    def search(self, query, k=10, where=None):
+        results = [index.search(query, k=k, where=where) for index in self.current()]
+        return _merge(results, k, key=lambda item: item[2], reverse=True)
+
+
+class ShardedDedupIndex(_ShardMap):
+    """Query-time view over per-shard near-duplicate indexes."""
+
+    def count(self):
+        counts = [index.count() for index in self.current()]
+        return sum(members for members, _ in counts), sum(clusters for _, clusters in counts)
+
+    def members(self, cluster_ids, where=None):
+        found = {}
+        for index in self.current():
+            found.update(index.members(cluster_ids, where))
+        return found
+
+    def matching_clusters(self, cluster_ids, where):
+        found = set()
+        for index in self.current():
+            found.update(index.matching_clusters(cluster_ids, where))
+        return found
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from core.index_pipeline import discover_files
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except Exception:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class ChangeBatch:
+    """Coalesces a burst of filesystem events into one set of index operations."""
+
+    def __init__(self):
+        self.changed = set()
+        self.deleted = set()
+        self.moved = {}
+
+    def __bool__(self):
+        return bool(self.changed or self.deleted or self.moved)
+
+    def add_changed(self, path):
+        self.deleted.discard(path)
+        self.changed.add(path)
+
+    def add_deleted(self, path):
+        self.changed.discard(path)
+        for old, new in list(self.moved.items()):
+            if new == path:
+                del self.moved[old]
+                path = old
+        self.deleted.add(path)
+
+    def add_moved(self, old, new):
+        if old in self.changed:
+            # Created (or rewritten) and renamed within one burst: only the
+            # final name matters, and it still needs a full index pass.
+            self.changed.discard(old)
+            self.changed.add(new)
+            return
+        for origin, target in list(self.moved.items()):
+            if target == old:
+                old = origin
+                del self.moved[origin]
+        self.deleted.discard(new)
+        if old == new:
+            self.changed.add(new)
+            return
+        self.moved[old] = new
+
+
+class _Debouncer:
+    def __init__(self, debounce, max_delay):
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._lock = threading.Lock()
+        self._batch = ChangeBatch()
+        self._first = None
+        self._last = None
+
+    def record(self, kind, path, dest=None):
+        with self._lock:
+            now = time.monotonic()
+            if self._first is None:
+                self._first = now
+            self._last = now
+            if kind == "changed":
+                self._batch.add_changed(path)
+            elif kind == "deleted":
+                self._batch.add_deleted(path)
+            elif kind == "moved":
+                self._batch.add_moved(path, dest)
+
+    def take_ready(self):
+        with self._lock:
+            if not self._batch:
+                return None
+            now = time.monotonic()
+            quiet = now - self._last >= self._debounce
+            overdue = now - self._first >= self._max_delay
+            if not (quiet or overdue):
+                return None
+            batch, self._batch = self._batch, ChangeBatch()
+            self._first = self._last = None
+            return batch
+
+
+def _is_note(vault_path, path):
+    try:
+        relative = Path(path).relative_to(vault_path)
+    except ValueError:
+        return False
+    if any(part.startswith(".") for part in relative.parts):
+        return False
+    return relative.suffix == ".md"
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, vault_path, debouncer, known_sources=None):
+        super().__init__()
+        self._vault_path = vault_path
+        self._debouncer = debouncer
+        self._known_sources = known_sources
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            self._on_directory_event(event)
+            return
+        src = str(Path(os.fsdecode(event.src_path)))
+        src_ok = _is_note(self._vault_path, src)
+        if event.event_type == "moved":
+            dest = str(Path(os.fsdecode(event.dest_path)))
+            dest_ok = _is_note(self._vault_path, dest)
+            if src_ok and dest_ok:
+                self._debouncer.record("moved", src, dest)
+            elif src_ok:
+                self._debouncer.record("deleted", src)
+            elif dest_ok:
+                self._debouncer.record("changed", dest)
+        elif not src_ok:
+            return
+        elif event.event_type == "deleted":
+            self._debouncer.record("deleted", src)
+        elif event.event_type in {"created", "modified", "closed"}:
+            self._debouncer.record("changed", src)
+
+    def _on_directory_event(self, event):
+        # Renaming or deleting a folder usually reports only the folder itself,
+        # so expand it into the notes the index holds (or the disk has) below it.
+        src = str(Path(os.fsdecode(event.src_path)))
+        if event.event_type == "created":
+            self._record_tree(src)
+            return
+        if event.event_type not in {"moved", "deleted"}:
+            return
+        dest = None
+        if event.event_type == "moved":
+            dest = str(Path(os.fsdecode(event.dest_path)))
+        known = self._known_sources(src) if self._known_sources is not None else []
+        targets = set()
+        for old in known:
+            new = os.path.join(dest, os.path.relpath(old, src)) if dest else None
+            if new is not None and _is_note(self._vault_path, new):
+                self._debouncer.record("moved", old, new)
+                targets.add(new)
+            else:
+                self._debouncer.record("deleted", old)
+        if dest is not None:
+            self._record_tree(dest, skip=targets)
+
+    def _record_tree(self, directory, skip=()):
+        if not os.path.isdir(directory):
+            return
+        for source, _ in discover_files(directory):
+            if source not in skip and _is_note(self._vault_path, source):
+                self._debouncer.record("changed", source)
+
+
+def _snapshot(vault_path):
+    return {
+        source: (stat.st_mtime, stat.st_size, stat.st_dev, stat.st_ino)
+        for source, stat in discover_files(vault_path)
+    }
+
+
+def _poll(vault_path, debouncer, interval, stop_event):
+    previous = _snapshot(vault_path)
+    while not stop_event.wait(interval):
+        current = _snapshot(vault_path)
+        created = {path: meta for path, meta in current.items() if path not in previous}
+        removed = {path: meta for path, meta in previous.items() if path not in current}
+        # A rename keeps the inode on the same filesystem, so pair them up.
+        by_inode = {(meta[2], meta[3]): path for path, meta in created.items()}
+        for path, meta in removed.items():
+            new = by_inode.pop((meta[2], meta[3]), None)
+            if new is not None:
+                debouncer.record("moved", path, new)
+                created.pop(new)
+                if current[new][:2] != meta[:2]:
+                    debouncer.record("changed", new)
+            else:
+                debouncer.record("deleted", path)
+        for path in created:
+            debouncer.record("changed", path)
+        for path, meta in current.items():
+            old = previous.get(path)
+            if old is not None and old[:2] != meta[:2]:
+                debouncer.record("changed", path)
+        previous = current
+
+
+def watch_vault(
+        vault_path,
+        on_batch,
+        debounce=1.5,
+        max_delay=30.0,
+        poll_interval=2.0,
+        use_polling=False,
+        known_sources=None,
+):
+    """Call on_batch(ChangeBatch) for every debounced burst of note changes until interrupted.
+
+    known_sources(directory) should return the indexed notes below directory;
+    it lets a renamed or deleted folder be expanded into its notes.
+    """
+    vault_path = str(Path(vault_path))
+    debouncer = _Debouncer(debounce, max_delay)
+    stop_event = threading.Event()
+    observer = None
+    if Observer is None and not use_polling:
+        print(
+            f"watchdog is not installed, so filesystem events are unavailable; polling the vault "
+            f"every {poll_interval}s instead (run `uv sync` to install it)."
+        )
+    elif not use_polling:
+        observer = Observer()
+        observer.schedule(_EventHandler(vault_path, debouncer, known_sources), vault_path, recursive=True)
+        try:
+            observer.start()
+        except OSError as e:
+            # e.g. the inotify watch limit on a large vault.
+            print(f"Could not watch filesystem events ({e}); polling the vault every {poll_interval}s instead.")
+            observer = None
+    if observer is None:
+        threading.Thread(
+            target=_poll,
+            args=(vault_path, debouncer, poll_interval, stop_event),
+            daemon=True,
+        ).start()
+    try:
+        while True:
+            time.sleep(0.2)
+            batch = debouncer.take_ready()
+            if batch:
+                on_batch(batch)
+    finally:
+        stop_event.set()
+        if observer is not None:
+            observer.stop()
+            observer.join()
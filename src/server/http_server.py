@@ -0,0 +1,291 @@
+"""HTTP API over AsyncRAGSession, streaming replies as Server-Sent Events.
+
+POST /sessions                      create a session ({"session_id"} optional)
+GET  /sessions?limit=&offset=       sessions from the history store, newest first
+GET  /sessions/{id}/history         messages of a session (limit, offset)
+POST /sessions/{id}/query           {"query": ...}; streams text, tool_call,
+                                    tool_result and done events (error on
+                                    failure). ?stream=false returns the done
+                                    event as JSON instead.
+GET  /health                        session count, running and queued turns
+"""
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager
+
+from aiohttp import web
+
+from core.rag_session import AsyncRAGSession, create_async_session_store
+from storage.chat_history_store import create_async_history_store
+
+
+class SessionPool:
+    """AsyncRAGSessions sharing one agent and one set of session and history stores.
+
+    Turns of a session run in the order they arrive; at most max_concurrency
+    turns run at once. Session state lives in the stores, so idle sessions
+    beyond max_sessions are dropped and rebuilt on their next request.
+    """
+
+    def __init__(
+            self,
+            agent=None,
+            summarize=None,
+            store=None,
+            history_store=None,
+            max_concurrency=8,
+            max_sessions=10000,
+            history_max_messages=30,
+    ):
+        self._agent = agent
+        self._summarize = summarize
+        self.store = store or create_async_session_store()
+        self.history_store = history_store if history_store is not None else create_async_history_store()
+        self._sessions = OrderedDict()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._max_sessions = max_sessions
+        self._history_max_messages = history_max_messages
+        self.running = 0
+        self.queued = 0
+
+    def session_ids(self):
+        return list(reversed(self._sessions))
+
+    async def session(self, session_id):
+        async with self._checked_out(session_id) as entry:
+            return entry.session
+
+    @asynccontextmanager
+    async def turn(self, session_id):
+        # The session's place in line is taken before a concurrency slot, so
+        # queued turns of a busy session do not hold slots other sessions could use.
+        async with self._checked_out(session_id) as entry:
+            self.queued += 1
+            started = False
+            try:
+                async with entry.lock:
+                    async with self._slots:
+                        self.queued -= 1
+                        self.running += 1
+                        started = True
+                        try:
+                            yield entry.session
+                        finally:
+                            self.running -= 1
+            finally:
+                if not started:
+                    # Cancelled (client gone) while still waiting for its turn.
+                    self.queued -= 1
+
+    @asynccontextmanager
+    async def _checked_out(self, session_id):
+        # Claimed before the first await: an entry in use is never evicted, so
+        # two requests for one session always share its session and lock.
+        entry = self._sessions.get(session_id)
+        created = entry is None
+        if created:
+            entry = _PoolEntry(
+                AsyncRAGSession(
+                    session_id=session_id,
+                    store=self.store,
+                    history_store=self.history_store,
+                    history_max_messages=self._history_max_messages,
+                    agent=self._agent,
+                    summarize=self._summarize,
+                )
+            )
+            self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        entry.users += 1
+        try:
+            if created:
+                self._evict()
+                await entry.session.restore_history()
+            yield entry
+        finally:
+            entry.users -= 1
+            self._evict()
+
+    async def aclose(self):
+        for store in (self.store, self.history_store):
+            if store is not None:
+                await store.aclose()
+
+    def _evict(self):
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self._max_sessions:
+                return
+            if not self._sessions[session_id].users:
+                del self._sessions[session_id]
+
+
+class _PoolEntry:
+    def __init__(self, session):
+        self.session = session
+        self.lock = asyncio.Lock()
+        # Requests holding or waiting on this session; evicted only at zero.
+        self.users = 0
+
+
+POOL = web.AppKey("pool", SessionPool)
+
+
+def create_app(pool):
+    app = web.Application()
+    app[POOL] = pool
+    app.add_routes(
+        [
+            web.post("/sessions", _create_session),
+            web.get("/sessions", _list_sessions),
+            web.get("/sessions/{session_id}/history", _session_history),
+            web.post("/sessions/{session_id}/query", _query),
+            web.get("/health", _health),
+        ]
+    )
+    app.on_cleanup.append(_close_pool)
+    return app
+
+
+async def _close_pool(app):
+    await app[POOL].aclose()
+
+
+async def _create_session(request):
+    body = await _json_body(request)
+    session_id = str(body.get("session_id") or uuid.uuid4())
+    await request.app[POOL].session(session_id)
+    return web.json_response({"session_id": session_id}, status=201)
+
+
+async def _list_sessions(request):
+    pool = request.app[POOL]
+    limit, offset = _int_param(request, "limit", 100), _int_param(request, "offset", 0)
+    if pool.history_store is None:
+        rows = [(session_id, None, None, None) for session_id in pool.session_ids()[offset:offset + limit]]
+    else:
+        rows = await pool.history_store.list_sessions(limit=limit, offset=offset)
+    sessions = [
+        {
+            "session_id": session_id,
+            "started_at": _timestamp(started_at),
+            "last_at": _timestamp(last_at),
+            "title": title,
+        }
+        for session_id, started_at, last_at, title in rows
+    ]
+    return web.json_response({"sessions": sessions})
+
+
+async def _session_history(request):
+    pool = request.app[POOL]
+    session_id = request.match_info["session_id"]
+    limit, offset = _int_param(request, "limit", 200), _int_param(request, "offset", 0)
+    if pool.history_store is None:
+        state = await pool.store.load(session_id)
+        messages = [dict(message, created_at=None) for message in state.get("history", [])[offset:offset + limit]]
+    else:
+        rows = await pool.history_store.get_messages(session_id, limit=limit, offset=offset)
+        messages = [
+            {"role": role, "content": content, "created_at": _timestamp(created_at)}
+            for role, content, created_at in rows
+        ]
+    return web.json_response({"session_id": session_id, "messages": messages})
+
+
+async def _query(request):
+    pool = request.app[POOL]
+    session_id = request.match_info["session_id"]
+    body = await _json_body(request)
+    query = str(body.get("query") or "").strip()
+    if not query:
+        raise web.HTTPBadRequest(text="Missing query")
+
+    if request.query.get("stream", "true").lower() in {"0", "false", "no"}:
+        async with pool.turn(session_id) as session:
+            text, artifacts = await session.aprocess_query(query)
+        return web.json_response({"type": "done", "text": text, "sources": _sources(artifacts)})
+
+    response = web.StreamResponse(
+        headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+    await response.prepare(request)
+    try:
+        async with pool.turn(session_id) as session:
+            # Closing the stream on a disconnect cancels the turn, which saves nothing.
+            async with aclosing(session.astream_query(query)) as events:
+                async for event in events:
+                    await response.write(_sse(event))
+    except ConnectionResetError:
+        return response
+    except Exception as e:
+        print(f"Error answering query in session {session_id}: {e}")
+        await response.write(_sse({"type": "error", "message": str(e)}))
+    await response.write_eof()
+    return response
+
+
+async def _health(request):
+    pool = request.app[POOL]
+    return web.json_response(
+        {
+            "status": "ok",
+            "sessions": len(pool.session_ids()),
+            "running_turns": pool.running,
+            "queued_turns": pool.queued,
+        }
+    )
+
+
+async def _json_body(request):
+    if not request.can_read_body:
+        return {}
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Body must be a JSON object")
+    return body
+
+
+def _int_param(request, name, default):
+    try:
+        return max(0, int(request.query.get(name, default)))
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} must be an integer")
+
+
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _sse(event):
+    payload = dict(event)
+    if payload["type"] == "tool_result":
+        payload["sources"] = _sources([payload.pop("artifact")])
+    elif payload["type"] == "done":
+        payload["sources"] = _sources(payload.pop("artifacts"))
+    data = json.dumps(payload, default=str)
+    return f"event: {payload['type']}\ndata: {data}\n\n".encode("utf-8")
+
+
+def _sources(artifacts):
+    # Same sources the TUI lists under a reply (see ui.chat_ui.render_sources).
+    sources = []
+    for artifact in artifacts or []:
+        for item in artifact if isinstance(artifact, list) else [artifact]:
+            if hasattr(item, "metadata"):
+                source = item.metadata.get("source")
+            elif isinstance(item, dict):
+                source = item.get("source")
+            else:
+                continue
+            if source and source not in sources:
+                sources.append(source)
+    return sources
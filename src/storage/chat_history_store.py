@@ -1,4 +1,6 @@
+import asyncio
 import sqlite3
+from contextlib import asynccontextmanager
 
 from core.config import get_setting
 
@@ -192,6 +194,145 @@ class PostgresHistoryStore:
                 conn.commit()
 
 
+class AsyncSQLiteHistoryStore:
+    """SQLiteHistoryStore for asyncio; each call runs on a worker thread."""
+
+    def __init__(self, path):
+        self._store = SQLiteHistoryStore(path)
+
+    async def append_message(self, session_id, role, content):
+        await asyncio.to_thread(self._store.append_message, session_id, role, content)
+
+    async def get_messages(self, session_id, limit=200, offset=0):
+        return await asyncio.to_thread(self._store.get_messages, session_id, limit, offset)
+
+    async def get_recent_messages(self, session_id, limit=200):
+        return await asyncio.to_thread(self._store.get_recent_messages, session_id, limit)
+
+    async def list_sessions(self, limit=100, offset=0):
+        return await asyncio.to_thread(self._store.list_sessions, limit, offset)
+
+    async def aclose(self):
+        pass
+
+
+class AsyncPostgresHistoryStore:
+    """PostgresHistoryStore for asyncio, reusing up to pool_size open connections."""
+
+    def __init__(self, dsn, pool_size=10):
+        self._dsn = dsn
+        self._idle = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._schema_ready = False
+
+    async def append_message(self, session_id, role, content):
+        async with self._connection() as conn:
+            await conn.execute(
+                """
+                INSERT INTO chat_messages (session_id, role, content)
+                VALUES (%s, %s, %s)
+                """,
+                (session_id, role, content),
+            )
+
+    async def get_messages(self, session_id, limit=200, offset=0):
+        async with self._connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT role, content, created_at
+                FROM chat_messages
+                WHERE session_id = %s
+                ORDER BY id ASC
+                    LIMIT %s
+                OFFSET %s
+                """,
+                (session_id, limit, offset),
+            )
+            return await cursor.fetchall()
+
+    async def get_recent_messages(self, session_id, limit=200):
+        async with self._connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT role, content, created_at
+                FROM chat_messages
+                WHERE session_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+                """,
+                (session_id, limit),
+            )
+            rows = await cursor.fetchall()
+        return list(reversed(rows))
+
+    async def list_sessions(self, limit=100, offset=0):
+        async with self._connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT
+                    session_id,
+                    MIN(created_at) AS started_at,
+                    MAX(created_at) AS last_at,
+                    (
+                        SELECT content
+                        FROM chat_messages m2
+                        WHERE m2.session_id = m1.session_id
+                            AND m2.role = 'user'
+                        ORDER BY id ASC
+                        LIMIT 1
+                    ) AS title
+                FROM chat_messages m1
+                GROUP BY session_id
+                ORDER BY last_at DESC
+                    LIMIT %s
+                OFFSET %s
+                """,
+                (limit, offset),
+            )
+            return await cursor.fetchall()
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+    @asynccontextmanager
+    async def _connection(self):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await psycopg.AsyncConnection.connect(self._dsn)
+            try:
+                if not self._schema_ready:
+                    await self._ensure_schema(conn)
+                yield conn
+                await conn.commit()
+            except BaseException:
+                # Also covers cancellation mid-query; the connection may be in
+                # an unknown state, so it is not reused.
+                await conn.close()
+                raise
+            self._idle.append(conn)
+
+    async def _ensure_schema(self, conn):
+        await conn.execute(
+            """
+            CREATE TABLE
+                IF NOT EXISTS chat_messages (
+                    id SERIAL PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW ()
+                )
+            """
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id "
+            "ON chat_messages (session_id, id)"
+        )
+        await conn.commit()
+        self._schema_ready = True
+
+
 def create_history_store():
     store_type = get_setting("history_store", default="sqlite")
     if store_type == "postgres":
@@ -201,3 +342,14 @@ def create_history_store():
         path = get_setting("sqlite_path", default="./chat_history.db")
         return SQLiteHistoryStore(path)
     return None
+
+
+def create_async_history_store():
+    store_type = get_setting("history_store", default="sqlite")
+    if store_type == "postgres":
+        dsn = get_setting("postgres_dsn", required=True)
+        return AsyncPostgresHistoryStore(dsn, pool_size=get_setting("postgres_pool_size", default=10))
+    if store_type == "sqlite":
+        path = get_setting("sqlite_path", default="./chat_history.db")
+        return AsyncSQLiteHistoryStore(path)
+    return None
@@ -253,6 +253,75 @@ def render_assistant(text):
     print("\n".join(lines))
 
 
+class StreamingAssistantBox:
+    """Draws the ASSISTANT box progressively while a reply streams in.
+
+    Partial text is wrapped as plain text and only the lines that changed
+    since the last update are redrawn. finish() swaps the box for the
+    Markdown rendering of the final reply while it still fits on screen.
+    """
+
+    def __init__(self):
+        term_width = _TERM_WIDTH or shutil.get_terminal_size((80, 20)).columns
+        safe_term_width = max(20, term_width - 2)
+        self._box_width = min(bubble_width_ratio(0.75), safe_term_width)
+        self._inner_width = max(10, self._box_width - 4)
+        self._live = sys.stdout.isatty()
+        self._lines = []
+        self._started = False
+
+    def update(self, text):
+        if not self._live:
+            return
+        if not self._started:
+            top, _ = format_box_lines("ASSISTANT", "", accent="36", box_width=self._box_width)
+            print(top[0])
+            self._started = True
+        wrapped = self._wrap(text)
+        changed = 0
+        while changed < min(len(wrapped), len(self._lines)) and wrapped[changed] == self._lines[changed]:
+            changed += 1
+        # Lines scrolled above the terminal can no longer be rewritten.
+        rows = shutil.get_terminal_size((80, 20)).lines
+        changed = min(len(wrapped), max(changed, len(self._lines) - (rows - 1)))
+        out = []
+        up = len(self._lines) - changed
+        if up > 0:
+            out.append(f"\033[{up}A")
+        for line in wrapped[changed:]:
+            out.append("\r\033[2K" + self._row(line) + "\n")
+        extra = len(self._lines) - len(wrapped)
+        if extra > 0:
+            out.append("\033[2K\n" * extra + f"\033[{extra}A")
+        sys.stdout.write("".join(out))
+        sys.stdout.flush()
+        self._lines = wrapped
+
+    def finish(self, text):
+        if not self._started:
+            if text:
+                render_assistant(text)
+            return
+        print(colorize(f"└{'─' * (self._box_width - 2)}┘", "36"))
+        drawn = len(self._lines) + 2
+        if drawn < shutil.get_terminal_size((80, 20)).lines:
+            clear_last_lines(drawn)
+            if text:
+                render_assistant(text)
+
+    def _wrap(self, text):
+        wrapped = []
+        for line in text.strip().splitlines() or [""]:
+            if line.strip() == "":
+                wrapped.append("")
+                continue
+            wrapped.extend(textwrap.wrap(line, width=self._inner_width) or [""])
+        return wrapped
+
+    def _row(self, line):
+        return f"│ {colorize(pad_visible(line, self._inner_width), '2;36')} │"
+
+
 def print_banner():
     term_width = shutil.get_terminal_size((80, 20)).columns
     title = "Obsidian Vault Chat"